@@ -0,0 +1,28 @@
+"""Add books.image_status for background image uploads
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that ran the old startup code already have the column
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("books")}
+    if "image_status" not in columns:
+        op.add_column(
+            "books",
+            sa.Column("image_status", sa.String(), nullable=False, server_default="ready"),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("books") as batch_op:
+        batch_op.drop_column("image_status")
@@ -0,0 +1,34 @@
+"""Indexes for the GET /books/ filters, sort orders and /my-books/
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Same as BookDBModel.__table_args__
+INDEXES = {
+    "ix_books_created_at_id": ["created_at", "id"],
+    "ix_books_price_created_at_id": ["price", "created_at", "id"],
+    "ix_books_course_code_created_at_id": ["course_code", "created_at", "id"],
+    "ix_books_course_code_price_created_at_id": ["course_code", "price", "created_at", "id"],
+    "ix_books_condition_created_at_id": ["condition", "created_at", "id"],
+    "ix_books_condition_price_created_at_id": ["condition", "price", "created_at", "id"],
+    "ix_books_user_id": ["user_id"],
+}
+
+
+def upgrade():
+    for name, columns in INDEXES.items():
+        # create_all may already have made some of them on newer databases
+        op.create_index(name, "books", columns, if_not_exists=True)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name="books", if_exists=True)
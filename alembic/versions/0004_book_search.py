@@ -0,0 +1,49 @@
+"""Full-text search column and trigram indexes for /books/search (Postgres only)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        # Other databases use the in-process search engine
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Generated column so Postgres keeps it up to date on every write. Title
+    # weighs more than author, author more than description. 'simple'
+    # because listings mix Swedish and English and stemming one language
+    # breaks the other.
+    op.execute("""
+        ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(author, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)")
+    # Typo tolerant matching on title + author
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_books_title_author_trgm ON books "
+        "USING gin ((title || ' ' || author) gin_trgm_ops)"
+    )
+    # Lets the ILIKE '%title%' filter of GET /books/ use an index
+    op.execute("CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_books_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_books_title_author_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_books_search_vector")
+    op.execute("ALTER TABLE books DROP COLUMN IF EXISTS search_vector")
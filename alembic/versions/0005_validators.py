@@ -0,0 +1,108 @@
+"""books.updated_at and courses.version for ETag / Last-Modified
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Same as app/models/book.py
+POSTGRES_TRIGGERS = (
+    """CREATE OR REPLACE FUNCTION bump_course_version() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE courses SET version = version + 1, updated_at = timezone('utc', now())
+            WHERE code IN (SELECT course_code FROM new_rows);
+        ELSIF TG_OP = 'UPDATE' THEN
+            UPDATE courses SET version = version + 1, updated_at = timezone('utc', now())
+            WHERE code IN (SELECT course_code FROM new_rows UNION SELECT course_code FROM old_rows);
+        ELSE
+            UPDATE courses SET version = version + 1, updated_at = timezone('utc', now())
+            WHERE code IN (SELECT course_code FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER books_course_version_insert AFTER INSERT ON books
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_course_version()""",
+    """CREATE TRIGGER books_course_version_update AFTER UPDATE ON books
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_course_version()""",
+    """CREATE TRIGGER books_course_version_delete AFTER DELETE ON books
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_course_version()""",
+)
+
+SQLITE_TRIGGERS = (
+    """CREATE TRIGGER books_course_version_insert AFTER INSERT ON books BEGIN
+        UPDATE courses SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE code = NEW.course_code;
+    END""",
+    """CREATE TRIGGER books_course_version_update AFTER UPDATE ON books BEGIN
+        UPDATE courses SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE code IN (OLD.course_code, NEW.course_code);
+    END""",
+    """CREATE TRIGGER books_course_version_delete AFTER DELETE ON books BEGIN
+        UPDATE courses SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE code = OLD.course_code;
+    END""",
+)
+
+TRIGGER_NAMES = (
+    "books_course_version_insert",
+    "books_course_version_update",
+    "books_course_version_delete",
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Databases made by create_all after this change already have these
+    if "updated_at" not in {column["name"] for column in inspector.get_columns("books")}:
+        op.add_column("books", sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute("UPDATE books SET updated_at = created_at")
+    course_columns = {column["name"] for column in inspector.get_columns("courses")}
+    if "version" not in course_columns:
+        op.add_column(
+            "courses",
+            sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+        )
+    if "updated_at" not in course_columns:
+        op.add_column("courses", sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+    if bind.dialect.name == "postgresql":
+        for name in TRIGGER_NAMES:
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON books")
+        for statement in POSTGRES_TRIGGERS:
+            op.execute(statement)
+    elif bind.dialect.name == "sqlite":
+        for name in TRIGGER_NAMES:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name in TRIGGER_NAMES:
+        if bind.dialect.name == "postgresql":
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON books")
+        else:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS bump_course_version()")
+
+    with op.batch_alter_table("courses") as batch_op:
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("version")
+    with op.batch_alter_table("books") as batch_op:
+        batch_op.drop_column("updated_at")
@@ -0,0 +1,37 @@
+"""saved_searches table for new listing alerts
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from fastapi_users_db_sqlalchemy.generics import GUID
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "saved_searches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", GUID(), nullable=False),
+        sa.Column("course_code", sa.String(), nullable=True),
+        sa.Column("price_max", sa.Integer(), nullable=True),
+        sa.Column("condition", sa.String(), nullable=True),
+        sa.Column("title_words", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["course_code"], ["courses.code"]),
+        sa.PrimaryKeyConstraint("id"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_saved_searches_id", "saved_searches", ["id"], if_not_exists=True)
+    op.create_index("ix_saved_searches_user_id", "saved_searches", ["user_id"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_table("saved_searches")
@@ -0,0 +1,28 @@
+"""Add books.image_variants for responsive images
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases made by create_all after this change already have the column
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("books")}
+    if "image_variants" not in columns:
+        op.add_column(
+            "books",
+            sa.Column("image_variants", sa.JSON(none_as_null=True), nullable=True),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("books") as batch_op:
+        batch_op.drop_column("image_variants")
@@ -0,0 +1,39 @@
+"""books.created_at NOT NULL, it is part of every listing sort key
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows inserted without a created_at (from before the model set it)
+    op.execute(
+        "UPDATE books SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) "
+        "WHERE created_at IS NULL"
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        op.alter_column(
+            "books", "created_at",
+            existing_type=sa.DateTime(),
+            nullable=False,
+        )
+    # SQLite can only change a column by rebuilding the table, which would
+    # drop the course version triggers from 0005. Its rows are backfilled
+    # above and new ones always get a value from the model.
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.alter_column(
+            "books", "created_at",
+            existing_type=sa.DateTime(),
+            nullable=True,
+        )
@@ -0,0 +1,36 @@
+# Saved-search alerts: new books are matched against every user's saved
+# searches and the matches are sent out in batches.
+from app.alerts.matcher import SavedSearchMatcher
+from app.alerts.notifier import AlertQueue, print_alerts
+from app.core.config import settings
+from app.database import SessionLocal
+
+saved_search_matcher = SavedSearchMatcher(SessionLocal, reload_after=settings.ALERT_RELOAD_SECONDS)
+
+alert_queue = AlertQueue(
+    batch_size=settings.ALERT_BATCH_SIZE,
+    interval=settings.ALERT_BATCH_SECONDS,
+    max_queued=settings.ALERT_QUEUE_SIZE,
+)
+
+# What an alert tells about the book
+ALERT_BOOK_FIELDS = ("id", "title", "author", "price", "condition", "course_code")
+
+
+async def queue_book_alerts(*books):
+    """Queue an alert for every user with a saved search matching one of books"""
+    for book in books:
+        try:
+            matches = await saved_search_matcher.match(book)
+        except Exception as e:
+            # Never fail the listing because of alerts
+            print(f"Matching saved searches failed: {e}")
+            continue
+        if not matches:
+            continue
+        fields = {
+            name: book[name] if isinstance(book, dict) else getattr(book, name)
+            for name in ALERT_BOOK_FIELDS
+        }
+        for user_id in {search["user_id"] for search in matches}:
+            alert_queue.submit(user_id, fields)
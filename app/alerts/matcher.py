@@ -0,0 +1,182 @@
+import asyncio
+import bisect
+import math
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+
+from sqlalchemy import select
+
+from app.models.saved_search import SavedSearchDBModel
+from app.search.tokens import tokenize
+
+
+def _field(book, name):
+    if isinstance(book, Mapping):
+        return book.get(name)
+    return getattr(book, name, None)
+
+
+def _ceiling(search):
+    return math.inf if search["price_max"] is None else search["price_max"]
+
+
+class _PriceIndex:
+    """Searches of one course, sorted by price ceiling"""
+
+    def __init__(self):
+        # (ceiling, search id), no ceiling sorts as infinity
+        self.keys = []
+
+    def add(self, search):
+        bisect.insort(self.keys, (_ceiling(search), search["id"]))
+
+    def remove(self, search):
+        key = (_ceiling(search), search["id"])
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def at_least(self, price):
+        """Ids of the searches whose ceiling is at or above price"""
+        start = bisect.bisect_left(self.keys, (price, -math.inf))
+        return [search_id for _, search_id in self.keys[start:]]
+
+
+class SavedSearchMatcher:
+    """
+    In-memory index of every saved search, for checking new books.
+
+    Searches are grouped by course code (None for the ones without one)
+    and sorted by price ceiling inside each group, so a new book only
+    looks at searches for its own course (plus the course-less ones) that
+    it is cheap enough for. Condition and title words are only checked on
+    those candidates.
+
+    The index is per process. Searches saved on this worker are added
+    right away, the whole index is reloaded in the background every
+    reload_after seconds to pick up the ones saved on other workers.
+    """
+
+    def __init__(self, session_factory, reload_after: int = 60):
+        self.session_factory = session_factory
+        self.reload_after = reload_after
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+        self._reload = None
+        self._searches = {}
+        self._by_course = defaultdict(_PriceIndex)
+        # add/remove calls made while a reload reads the table, None when
+        # no reload is running
+        self._changes = None
+
+    def _fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_after
+
+    async def _ensure_loaded(self):
+        if self._loaded_at is None:
+            await self._load()
+        elif not self._fresh() and self._reload is None:
+            # Keep matching against the current index while it reloads
+            self._reload = asyncio.create_task(self._load())
+            self._reload.add_done_callback(self._reload_done)
+
+    def _reload_done(self, task):
+        self._reload = None
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Reloading saved searches failed: {task.exception()}")
+
+    async def _load(self):
+        async with self._lock:
+            if self._fresh():
+                # Someone else loaded it while we waited
+                return
+            # Searches added or removed on this worker while the SELECT
+            # runs may or may not be in its rows, so those calls are
+            # replayed on the new index
+            self._changes = []
+            try:
+                async with self.session_factory() as session:
+                    result = await session.execute(select(
+                        SavedSearchDBModel.id,
+                        SavedSearchDBModel.user_id,
+                        SavedSearchDBModel.course_code,
+                        SavedSearchDBModel.price_max,
+                        SavedSearchDBModel.condition,
+                        SavedSearchDBModel.title_words,
+                    ))
+                    rows = result.mappings().all()
+            finally:
+                changes, self._changes = self._changes, None
+            self._searches = {}
+            self._by_course = defaultdict(_PriceIndex)
+            for row in rows:
+                self.add(row)
+            for method, arg in changes:
+                method(arg)
+            self._loaded_at = time.monotonic()
+
+    def add(self, search):
+        """Add or replace a saved search (a row or a dict with its columns)"""
+        if self._changes is not None:
+            self._changes.append((self.add, search))
+        search = {
+            "id": search["id"],
+            "user_id": search["user_id"],
+            "course_code": search["course_code"] or None,
+            "price_max": search["price_max"],
+            "condition": search["condition"] or None,
+            "words": frozenset(tokenize(search["title_words"] or "")),
+        }
+        self._discard(search["id"])
+        self._searches[search["id"]] = search
+        self._by_course[search["course_code"]].add(search)
+
+    def remove(self, search_id: int):
+        if self._changes is not None:
+            self._changes.append((self.remove, search_id))
+        self._discard(search_id)
+
+    def _discard(self, search_id: int):
+        search = self._searches.pop(search_id, None)
+        if search is not None:
+            index = self._by_course[search["course_code"]]
+            index.remove(search)
+            if not index.keys:
+                del self._by_course[search["course_code"]]
+
+    def remove_user(self, user_id):
+        if self._changes is not None:
+            self._changes.append((self.remove_user, user_id))
+        for search in [s for s in self._searches.values() if s["user_id"] == user_id]:
+            self._discard(search["id"])
+
+    async def match(self, book):
+        """The saved searches (as dicts) that book matches"""
+        await self._ensure_loaded()
+        price = _field(book, "price")
+        condition = _field(book, "condition")
+        owner = _field(book, "user_id")
+        title_words = None
+
+        matches = []
+        for course_code in {_field(book, "course_code"), None}:
+            index = self._by_course.get(course_code)
+            if index is None:
+                continue
+            for search_id in index.at_least(price):
+                search = self._searches[search_id]
+                if search["user_id"] == owner:
+                    continue
+                if search["condition"] and search["condition"] != condition:
+                    continue
+                if search["words"]:
+                    if title_words is None:
+                        title_words = set(tokenize(_field(book, "title")))
+                    if not search["words"] <= title_words:
+                        continue
+                matches.append(search)
+        return matches
+
+    def __len__(self):
+        return len(self._searches)
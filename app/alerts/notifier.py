@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import defaultdict
+
+
+async def print_alerts(alerts):
+    """Default sender: log one line per user"""
+    for user_id, books in alerts.items():
+        titles = ", ".join(book["title"] for book in books)
+        print(f"Alert for user {user_id}: {len(books)} new matching listing(s): {titles}")
+
+
+class AlertQueue:
+    """
+    Collects saved-search matches and hands them to the sender in batches.
+
+    submit() never waits: matches go into a bounded queue (dropped with a
+    warning when it is full) and one background task drains it, sending
+    whatever came in during the last `interval` seconds, up to batch_size
+    at a time, grouped per user. A book matching several of a user's
+    searches is only sent once.
+    """
+
+    def __init__(self, sender=print_alerts, batch_size: int = 100,
+                 interval: float = 5.0, max_queued: int = 10_000):
+        self.sender = sender
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queued = max_queued
+        self._queue = None
+        self._worker = None
+
+    def submit(self, user_id, book: dict):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._worker = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait((user_id, book))
+        except asyncio.QueueFull:
+            print(f"Alert queue full, dropping alert for user {user_id}")
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send(self, batch):
+        alerts = defaultdict(dict)
+        for user_id, book in batch:
+            alerts[user_id][book["id"]] = book
+        try:
+            await self.sender({user_id: list(books.values()) for user_id, books in alerts.items()})
+        except Exception as e:
+            print(f"Sending alerts failed: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _run(self):
+        while True:
+            await self._send(await self._next_batch())
+
+    async def join(self):
+        """Wait until every submitted alert has been sent"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, timeout: float = 10):
+        """Send what is queued (up to timeout) and stop the worker"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print("Gave up waiting for alerts on shutdown")
+        self._worker.cancel()
+        self._queue = None
+        self._worker = None
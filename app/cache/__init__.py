@@ -0,0 +1,82 @@
+# Read-through cache for book queries.
+#
+# Entries are tagged (e.g. "course:MVE425", "book:12") and every tag has a
+# version number that is part of the cache key. Invalidating a tag bumps
+# its version, so only entries carrying that tag stop matching and the rest
+# of the cache is left alone.
+import functools
+import inspect
+import json
+from collections.abc import Mapping
+
+from app.core.config import settings
+from app.cache.backends import MISSING, MemoryCache, RedisCache, NullCache
+
+_cache = None
+
+
+def get_cache():
+    """Return the cache backend configured in settings"""
+    global _cache
+    if _cache is None:
+        if settings.CACHE_BACKEND == "redis":
+            _cache = RedisCache(settings.CACHE_URL, ttl=settings.CACHE_TTL)
+        elif settings.CACHE_BACKEND == "memory":
+            _cache = MemoryCache(max_entries=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL)
+        else:
+            _cache = NullCache()
+    return _cache
+
+
+def _plain(value):
+    """Turn query results (RowMappings) into plain data that can be cached"""
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_plain(item) for item in value)
+    return value
+
+
+def _normalize(params: dict) -> str:
+    # Empty strings and None both mean "no filter" in the queries
+    cleaned = {
+        name: value for name, value in params.items()
+        if value is not None and value != ""
+    }
+    return json.dumps(cleaned, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def cached(namespace: str, tags):
+    """
+    Cache the result of an async CRUD function that takes db as its first
+    argument. tags is called with the bound arguments and returns the tags
+    for the entry.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(db, *args, **kwargs):
+            bound = signature.bind(db, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            params.pop("db")
+
+            cache = get_cache()
+            entry_tags = tags(params)
+            versions = await cache.get_versions(entry_tags)
+            key = f"{namespace}:{_normalize(params)}:{'.'.join(map(str, versions))}"
+
+            value = await cache.get(key)
+            if value is MISSING:
+                value = _plain(await func(db, *args, **kwargs))
+                await cache.set(key, value)
+            return value
+
+        return wrapper
+    return decorator
+
+
+async def invalidate(*tags):
+    """Drop every cached entry carrying one of the tags"""
+    await get_cache().bump_versions(tags)
@@ -0,0 +1,133 @@
+import pickle
+import time
+from collections import OrderedDict
+
+# Returned by get() on a cache miss, since None is a valid cached value
+MISSING = object()
+
+
+class MemoryCache:
+    """
+    Per-process LRU cache with a TTL.
+
+    Tag versions come from one counter that only goes up, so a version is
+    never handed out twice. That lets a tag's version be forgotten once
+    every entry made before its last bump has expired: the tag reads as 0
+    again, and no live entry can still carry a 0 for it. Only tags bumped
+    within the last TTL are kept, however many books have been written.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: int = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # tag -> (version, bumped at), oldest bump first
+        self._versions = OrderedDict()
+        self._last_version = 0
+        # Longest TTL any entry was stored with
+        self._max_ttl = ttl
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        self._max_ttl = max(self._max_ttl, ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_versions(self, tags):
+        self._forget_versions(time.monotonic())
+        return [self._versions[tag][0] if tag in self._versions else 0 for tag in tags]
+
+    async def bump_versions(self, tags):
+        now = time.monotonic()
+        self._forget_versions(now)
+        for tag in tags:
+            self._last_version += 1
+            self._versions[tag] = (self._last_version, now)
+            self._versions.move_to_end(tag)
+
+    def _forget_versions(self, now: float):
+        while self._versions:
+            tag, (_, bumped_at) = next(iter(self._versions.items()))
+            if now - bumped_at <= self._max_ttl:
+                break
+            del self._versions[tag]
+
+    async def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+
+
+class RedisCache:
+    """
+    Cache shared by all workers through Redis.
+
+    Needs the optional `redis` package. Eviction is left to Redis itself
+    (run it with maxmemory-policy allkeys-lru), every entry gets a TTL.
+    """
+
+    def __init__(self, url: str, ttl: int = 30, prefix: str = "campusbooks:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package installed")
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    async def get(self, key):
+        data = await self._redis.get(self.prefix + key)
+        if data is None:
+            return MISSING
+        return pickle.loads(data)
+
+    async def set(self, key, value, ttl=None):
+        await self._redis.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.ttl)
+
+    async def get_versions(self, tags):
+        if not tags:
+            return []
+        values = await self._redis.mget([f"{self.prefix}v:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def bump_versions(self, tags):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{self.prefix}v:{tag}")
+            await pipe.execute()
+
+    async def clear(self):
+        keys = [key async for key in self._redis.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+
+class NullCache:
+    """Cache that stores nothing, used when caching is turned off"""
+
+    async def get(self, key):
+        return MISSING
+
+    async def set(self, key, value, ttl=None):
+        pass
+
+    async def get_versions(self, tags):
+        return [0 for _ in tags]
+
+    async def bump_versions(self, tags):
+        pass
+
+    async def clear(self):
+        pass
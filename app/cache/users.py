@@ -0,0 +1,79 @@
+# Verified token -> user cache for the authentication dependencies.
+#
+# Without it every request to a protected route decodes the JWT and loads
+# the user row. Entries hold a plain snapshot of the user's columns and
+# every hit gets its own detached User built from it, so requests never
+# share an ORM instance. The cache is per worker: the UserManager hooks
+# drop a user's entries on the worker that made the change, the others
+# catch up within the TTL.
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+
+class UserSnapshotCache:
+    """LRU of token -> (expires_at, user snapshot), bounded by max_entries"""
+
+    def __init__(self, user_model, max_entries: int = 10_000, ttl: int = 30):
+        self.user_model = user_model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._columns = [attr.key for attr in inspect(user_model).mapper.column_attrs]
+        self._entries = OrderedDict()
+        # user id -> tokens cached for that user, for invalidation
+        self._tokens = {}
+
+    def get(self, token: str):
+        """A detached copy of the cached user, or None"""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            self._discard(token)
+            return None
+        self._entries.move_to_end(token)
+        user = self.user_model(**snapshot)
+        # Loaded state with an identity, so adding it to a session
+        # updates the existing row instead of inserting a new one
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, token: str, user, token_expires_at=None):
+        if self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        if token_expires_at is not None:
+            # Never serve a token past its own expiry
+            expires_at = min(expires_at, time.monotonic() + token_expires_at - time.time())
+        snapshot = {name: getattr(user, name) for name in self._columns}
+
+        self._discard(token)
+        self._entries[token] = (expires_at, snapshot)
+        self._tokens.setdefault(user.id, set()).add(token)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        for token in self._tokens.pop(user_id, ()):
+            self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens.clear()
+
+    def _discard(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[1]["id"]
+        tokens = self._tokens.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[user_id]
+
+    def __len__(self):
+        return len(self._entries)
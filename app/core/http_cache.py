@@ -0,0 +1,87 @@
+# Helpers for HTTP conditional requests (ETag / Last-Modified / 304).
+#
+# Routes build a validator from data they already have (a book's
+# updated_at, a course's version) and check it before doing any work, so a
+# revalidation that hits answers 304 without loading or encoding the body.
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Cache-Control per endpoint. Short max-age so browsers and the CDN come
+# back often, stale-while-revalidate so those revalidations stay off the
+# critical path.
+BOOK_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=300"
+COURSE_BOOKS_CACHE_CONTROL = "public, max-age=15, stale-while-revalidate=60"
+COURSE_CODES_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime for the Last-Modified header"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> dict:
+    """ETag, Last-Modified and Cache-Control headers for a response"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    True if the client's copy is still current. If-None-Match wins over
+    If-Modified-Since, as RFC 9110 says.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" and "x" are the same validator
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Last-Modified only has whole seconds
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def not_modified_response(headers: dict) -> Response:
+    """304 carrying the same validators the full response would have"""
+    return Response(status_code=304, headers=headers)
+
+
+def accepts_encoding(request: Request, coding: str) -> bool:
+    """
+    True if Accept-Encoding allows coding, by name or through "*". A q of
+    0 (e.g. "gzip;q=0") refuses it, and so does an unreadable q.
+    """
+    wildcard = None
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return bool(wildcard)
@@ -1,71 +1,218 @@
-from sqlalchemy import Column, String, select, update, delete
+from sqlalchemy import Column, String, select, update, delete, tuple_, func, case, literal, literal_column, union_all
 from sqlalchemy.orm import Session
 from app.database import Base
 from app.models.book import BookDBModel
-from app.schemas.book import BookBase, BookCreate
-from app.crud.uploadImage import upload_to_cloudinary
+from app.userDB import User
+from app.schemas.book import BookBase, BookCreate, BookUpdate
+from app.crud.uploadImage import image_upload_queue, spool_upload
+from app.database import SessionLocal, engine
+from app.search import get_search_engine
+from app.cache import cached, invalidate
+from app.events import book_created_event, book_deleted_event, book_updated_event, publish_book_events
+from app.alerts import queue_book_alerts
+from app.core.config import settings
 from typing import List, Optional
 from app import models
+from datetime import datetime
+import base64
+import os
+import json
 import uuid
 
 # Update your book CRUD functions to use async SQLAlchemy
 
+# Columns returned by every book query (matches BookAPIModel)
+BOOK_COLUMNS = (
+    BookDBModel.id,
+    BookDBModel.title,
+    BookDBModel.author,
+    BookDBModel.price,
+    BookDBModel.description,
+    BookDBModel.condition,
+    BookDBModel.course_code,
+    BookDBModel.image_url,
+    BookDBModel.image_status,
+    BookDBModel.image_variants,
+    BookDBModel.user_id,
+    BookDBModel.created_at,
+    BookDBModel.updated_at,
+)
+
+# Sort orders supported by the listing endpoint. Each one maps to the key
+# columns used for ORDER BY and for the keyset cursor; the composite indexes
+# on BookDBModel cover these exact column orders.
+SORT_KEYS = {
+    "newest": (("created_at", "desc"), ("id", "desc")),
+    "price_asc": (("price", "asc"), ("created_at", "asc"), ("id", "asc")),
+    "price_desc": (("price", "desc"), ("created_at", "desc"), ("id", "desc")),
+}
+
+
+def encode_cursor(sort: str, row) -> str:
+    """Build an opaque cursor pointing just after the given row"""
+    values = []
+    for name, _ in SORT_KEYS[sort]:
+        value = row[name]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        values.append(value)
+    payload = json.dumps([sort, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(sort: str, cursor: str) -> list:
+    """Decode a cursor made by encode_cursor, raises ValueError if it is invalid"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, values = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the requested sort")
+    if not isinstance(values, list) or len(values) != len(SORT_KEYS[sort]):
+        raise ValueError("Malformed cursor")
+
+    decoded = []
+    for (name, _), value in zip(SORT_KEYS[sort], values):
+        if name == "created_at":
+            if not isinstance(value, str):
+                raise ValueError("Malformed cursor")
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("Malformed cursor")
+        decoded.append(value)
+    return decoded
+
+
+def _apply_sort(stmt, sort: str, cursor: Optional[str] = None):
+    """Add ORDER BY for the sort and, if given, a keyset predicate for the cursor"""
+    keys = SORT_KEYS[sort]
+    columns = [getattr(BookDBModel, name) for name, _ in keys]
+
+    if cursor:
+        values = decode_cursor(sort, cursor)
+        # All key columns share one direction, so a row-value comparison
+        # can be answered with a single index range scan.
+        if keys[0][1] == "desc":
+            stmt = stmt.where(tuple_(*columns) < tuple_(*values))
+        else:
+            stmt = stmt.where(tuple_(*columns) > tuple_(*values))
+
+    order = [col.desc() if direction == "desc" else col.asc()
+             for col, (_, direction) in zip(columns, keys)]
+    return stmt.order_by(*order)
+
+def _list_tags(params):
+    # Lists filtered on a course only change when that course changes
+    if params.get("course_code"):
+        return [f"course:{params['course_code']}"]
+    return ["books"]
+
+
+async def _invalidate_book(book_id, *course_codes):
+    """Drop cached entries that may contain this book"""
+    await invalidate(
+        f"book:{book_id}",
+        "books",
+        *{f"course:{code}" for code in course_codes if code},
+    )
+
 async def CRUDcreate_book(db, book: BookCreate, image, user_id):
-    """Create a book with the current user as the owner"""
-    link = await upload_to_cloudinary(image)
-    db_book = BookDBModel(**book.dict(), user_id=user_id)
-    db_book.image_url = link
-    db.add(db_book)
-    await db.commit()
-    await db.refresh(db_book)
+    """
+    Create a book with the current user as the owner.
+    The image is uploaded in the background, until then image_status is "pending".
+    """
+    path, content_type = await spool_upload(image)
+    try:
+        db_book = BookDBModel(**book.dict(), user_id=user_id, image_status="pending")
+        db.add(db_book)
+        await db.commit()
+        await db.refresh(db_book)
+    except BaseException:
+        os.remove(path)
+        raise
+    await get_search_engine().index_book(db_book)
+    await _invalidate_book(db_book.id, db_book.course_code)
+    await publish_book_events(book_created_event(db_book))
+    await queue_book_alerts(db_book)
+
+    await image_upload_queue.enqueue(path, content_type, book_image_callback(db_book.id))
     return db_book
 
+def book_image_callback(book_id: int):
+    """on_complete for ImageUploadQueue that stores the result on the book"""
+    async def on_upload_complete(image_url, status, variants=None):
+        async with SessionLocal() as session:
+            await CRUDset_book_image(session, book_id, image_url, status, variants)
+    return on_upload_complete
+
+async def CRUDset_book_image(db, book_id: int, image_url: Optional[str], status: str,
+                             variants: Optional[List[dict]] = None):
+    """Store the result of a background image upload"""
+    stmt = (
+        update(BookDBModel)
+        .where(BookDBModel.id == book_id)
+        .values(image_url=image_url, image_status=status, image_variants=variants or None)
+        .returning(*BOOK_COLUMNS)
+    )
+    result = await db.execute(stmt)
+    book = result.mappings().one_or_none()
+    await db.commit()
+    if book is None:
+        # Deleted while its image was uploading
+        return
+    await _invalidate_book(book_id, book["course_code"])
+    # Streams got the book while its image was still pending
+    await publish_book_events(book_updated_event(book))
+
+@cached("book", lambda params: [f"book:{params['book_id']}"])
 async def CRUDget_book(db, book_id: int):
     """Get a book by its ID"""
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).where(BookDBModel.id == book_id)
+    stmt = select(*BOOK_COLUMNS).where(BookDBModel.id == book_id)
     result = await db.execute(stmt)
     return result.mappings().one_or_none()
 
-async def CRUDget_books_with_filters(
-    db,
-    skip: int = 0,
-    limit: int = 100,
+async def CRUDget_books_by_ids(db, book_ids: List[int], with_seller: bool = False):
+    """
+    Get many books in one query, in the order of book_ids.
+    Missing ids are skipped. with_seller adds the seller's email and phone.
+    """
+    columns = list(BOOK_COLUMNS)
+    if with_seller:
+        columns += [
+            User.email.label("seller_email"),
+            User.phone_number.label("seller_phone_number"),
+        ]
+    stmt = select(*columns).where(BookDBModel.id.in_(book_ids))
+    if with_seller:
+        stmt = stmt.outerjoin(User, User.id == BookDBModel.user_id)
+
+    result = await db.execute(stmt)
+    books = {book["id"]: book for book in result.mappings().all()}
+    return [books[book_id] for book_id in dict.fromkeys(book_ids) if book_id in books]
+
+async def CRUDget_seller_info(db, book_id: int):
+    """
+    Get the seller's email and phone number for a book in one query.
+    Returns None if the book doesn't exist, email is None if the owner is gone.
+    """
+    stmt = (
+        select(BookDBModel.id, User.email, User.phone_number)
+        .outerjoin(User, User.id == BookDBModel.user_id)
+        .where(BookDBModel.id == book_id)
+    )
+    result = await db.execute(stmt)
+    return result.mappings().one_or_none()
+
+def filtered_books_query(
+    stmt,
     course_code: Optional[str] = None,
     price_min: Optional[int] = None,
     price_max: Optional[int] = None,
     condition: Optional[str] = None,
     title: Optional[str] = None,
 ):
-    """
-    Retrieve books with optional filtering.
-    """
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).offset(skip).limit(limit)
-    
-    # Add filters
+    """Add the GET /books/ filters to a select on books"""
     if course_code:
         stmt = stmt.where(BookDBModel.course_code == course_code)
     if price_min is not None:
@@ -76,112 +223,354 @@ async def CRUDget_books_with_filters(
         stmt = stmt.where(BookDBModel.condition == condition)
     if title:
         stmt = stmt.where(BookDBModel.title.ilike(f"%{title}%"))
-        
+    return stmt
+
+# Lower bounds of the price facet buckets, in kr
+PRICE_BUCKETS = (0, 100, 200, 300, 500, 1000)
+
+
+def _price_bucket_labels():
+    labels = []
+    for low, high in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + (None,)):
+        labels.append(f"{low}-{high - 1}" if high else f"{low}+")
+    return labels
+
+
+def _price_bucket():
+    # Index into PRICE_BUCKETS. Inlined constants, not bind parameters, so
+    # Postgres sees the same expression in SELECT and GROUP BY.
+    return case(
+        *[
+            (BookDBModel.price < literal_column(str(high)), literal_column(str(index)))
+            for index, high in enumerate(PRICE_BUCKETS[1:])
+        ],
+        else_=literal_column(str(len(PRICE_BUCKETS) - 1)),
+    )
+
+@cached("facets", _list_tags)
+async def CRUDget_book_facets(
+    db,
+    course_code: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    title: Optional[str] = None,
+):
+    """
+    Count matching books per course code, condition and price bucket
+    with a single query.
+    """
+    filters = dict(
+        course_code=course_code,
+        price_min=price_min,
+        price_max=price_max,
+        condition=condition,
+        title=title,
+    )
+    bucket = _price_bucket()
+
+    if engine.dialect.name == "postgresql":
+        # One pass over the matching rows for all three groupings
+        stmt = filtered_books_query(
+            select(
+                func.grouping(BookDBModel.course_code).label("by_course"),
+                func.grouping(BookDBModel.condition).label("by_condition"),
+                BookDBModel.course_code,
+                BookDBModel.condition,
+                bucket.label("price_bucket"),
+                func.count().label("count"),
+            ),
+            **filters,
+        ).group_by(func.grouping_sets(
+            tuple_(BookDBModel.course_code),
+            tuple_(BookDBModel.condition),
+            tuple_(bucket),
+        ))
+        result = await db.execute(stmt)
+        rows = [
+            ("course_code" if row.by_course == 0 else
+             "condition" if row.by_condition == 0 else "price",
+             row.course_code if row.by_course == 0 else
+             row.condition if row.by_condition == 0 else row.price_bucket,
+             row.count)
+            for row in result
+        ]
+    else:
+        # No GROUPING SETS, still a single round trip
+        def facet(name, column):
+            return filtered_books_query(
+                select(literal(name).label("facet"), column.label("value"), func.count().label("count")),
+                **filters,
+            ).group_by(column)
+
+        stmt = union_all(
+            facet("course_code", BookDBModel.course_code),
+            facet("condition", BookDBModel.condition),
+            facet("price", bucket),
+        )
+        result = await db.execute(stmt)
+        rows = [(row.facet, row.value, row.count) for row in result]
+
+    labels = _price_bucket_labels()
+    facets = {"course_code": {}, "condition": {}, "price": dict.fromkeys(labels, 0)}
+    for name, value, count in rows:
+        if name == "price":
+            value = labels[int(value)]
+        elif value is None:
+            # Books without a course code only count towards the total
+            continue
+        facets[name][value] = count
+
+    # Biggest first
+    for name in ("course_code", "condition"):
+        facets[name] = dict(sorted(facets[name].items(), key=lambda item: (-item[1], item[0])))
+    # condition is NOT NULL, so its counts cover every matching book
+    facets["total"] = sum(facets["condition"].values())
+    return facets
+
+@cached("books", _list_tags)
+async def CRUDget_books_with_filters(
+    db,
+    skip: int = 0,
+    limit: int = 100,
+    course_code: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    title: Optional[str] = None,
+    sort: str = "newest",
+    cursor: Optional[str] = None,
+):
+    """
+    Retrieve books with optional filtering.
+
+    Returns a tuple of (books, next_cursor). When a cursor is given it is
+    used instead of skip, so deep pages cost the same as the first one.
+    next_cursor is None on the last page.
+    """
+    stmt = filtered_books_query(
+        select(*BOOK_COLUMNS),
+        course_code=course_code,
+        price_min=price_min,
+        price_max=price_max,
+        condition=condition,
+        title=title,
+    )
+    stmt = _apply_sort(stmt, sort, cursor)
+    if not cursor:
+        stmt = stmt.offset(skip)
+    # Fetch one extra row to know if there is a next page
+    stmt = stmt.limit(limit + 1)
+
     result = await db.execute(stmt)
-    return result.mappings().all()
+    books = result.mappings().all()
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(sort, books[-1])
+    return books, next_cursor
+
+async def _planner_row_estimate(db, stmt) -> int:
+    """Postgres' own estimate of how many rows a query returns, from EXPLAIN"""
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = compiled.construct_params()
+    if compiled.positiontup:
+        params = tuple(params[name] for name in compiled.positiontup)
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+@cached("count", _list_tags)
+async def CRUDcount_books(
+    db,
+    course_code: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    title: Optional[str] = None,
+):
+    """
+    Number of books matching the GET /books/ filters, as {"total", "exact"}.
+
+    Counting stops at EXACT_COUNT_THRESHOLD rows, so small result sets get
+    an exact total for the price of an index range scan. Bigger ones get
+    the planner's estimate on Postgres instead of a full count. Results are
+    cached and invalidated like the listings.
+    """
+    filters = dict(
+        course_code=course_code,
+        price_min=price_min,
+        price_max=price_max,
+        condition=condition,
+        title=title,
+    )
+    threshold = settings.EXACT_COUNT_THRESHOLD
+    limited = filtered_books_query(select(BookDBModel.id), **filters).limit(threshold + 1).subquery()
+    result = await db.execute(select(func.count()).select_from(limited))
+    total = result.scalar_one()
+    if total <= threshold:
+        return {"total": total, "exact": True}
+
+    if engine.dialect.name == "postgresql":
+        estimate = await _planner_row_estimate(db, filtered_books_query(select(BookDBModel.id), **filters))
+        # The estimate can't be lower than what we already counted
+        return {"total": max(estimate, total), "exact": False}
 
-async def CRUDget_books_by_course(db, course_code: str):
-    """Get all books for a specific course"""
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).where(BookDBModel.course_code == course_code)
+    # No planner statistics to go on, count it all
+    result = await db.execute(
+        select(func.count()).select_from(filtered_books_query(select(BookDBModel.id), **filters).subquery())
+    )
+    return {"total": result.scalar_one(), "exact": True}
+
+@cached("books_by_course", _list_tags)
+async def CRUDget_books_by_course(db, course_code: str, version: Optional[int] = None):
+    """
+    Get all books for a specific course. version is the course's version
+    and only goes into the cache key, so a cached list always matches the
+    ETag built from that version.
+    """
+    stmt = select(*BOOK_COLUMNS).where(BookDBModel.course_code == course_code)
     result = await db.execute(stmt)
     return result.mappings().all()
 
 async def CRUDget_books_by_user(db, user_id):
     """Get all books owned by a specific user"""
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).where(BookDBModel.user_id == user_id)
+    stmt = select(*BOOK_COLUMNS).where(BookDBModel.user_id == user_id)
     result = await db.execute(stmt)
     return result.mappings().all()
 
-async def CRUDdelete_book(db, book_id: int):
-    """Delete a book from the database"""
+async def CRUDbook_exists(db, book_id: int) -> bool:
+    """True if there is a book with this ID"""
+    result = await db.execute(select(BookDBModel.id).where(BookDBModel.id == book_id))
+    return result.first() is not None
+
+async def CRUDdelete_book(db, book_id: int, user_id=None):
+    """
+    Delete a book, only if user_id owns it when user_id is given.
+    Returns False if no book was deleted.
+    """
     stmt = delete(BookDBModel).where(BookDBModel.id == book_id)
-    await db.execute(stmt)
+    if user_id is not None:
+        stmt = stmt.where(BookDBModel.user_id == user_id)
+    result = await db.execute(stmt.returning(BookDBModel.course_code))
+    deleted = result.first()
     await db.commit()
+    if deleted is None:
+        return False
+    await get_search_engine().remove_book(book_id)
+    await _invalidate_book(book_id, deleted.course_code)
+    await publish_book_events(book_deleted_event(book_id, deleted.course_code))
     return True
 
-async def CRUDupdate_book(db, book_id: int, update_data: dict):
-    """Update a book's information"""
-    stmt = update(BookDBModel).where(BookDBModel.id == book_id).values(**update_data)
-    await db.execute(stmt)
+async def CRUDupdate_book(db, book_id: int, update_data: BookUpdate, user_id=None):
+    """
+    Update a book, only if user_id owns it when user_id is given.
+    Returns the updated book, or None if no book was updated. With nothing
+    to change the book is returned as it is, under the same condition.
+    """
+    values = update_data.model_dump(exclude_unset=True, exclude_none=True)
+    if not values:
+        stmt = select(*BOOK_COLUMNS).where(BookDBModel.id == book_id)
+        if user_id is not None:
+            stmt = stmt.where(BookDBModel.user_id == user_id)
+        result = await db.execute(stmt)
+        book = result.mappings().one_or_none()
+        return dict(book) if book is not None else None
+
+    stmt = update(BookDBModel).where(BookDBModel.id == book_id).values(**values)
+    if user_id is not None:
+        stmt = stmt.where(BookDBModel.user_id == user_id)
+    returning = list(BOOK_COLUMNS)
+
+    old_course_code = None
+    if "course_code" in values:
+        # The book leaves its old course, so that course's pages change too
+        if engine.dialect.name == "postgresql":
+            # Join the row as it was before the update to get the old code
+            # back from the same statement
+            old = (
+                select(BookDBModel.id, BookDBModel.course_code)
+                .where(BookDBModel.id == book_id)
+                .subquery("old")
+            )
+            stmt = stmt.where(BookDBModel.id == old.c.id)
+            returning.append(old.c.course_code.label("old_course_code"))
+        else:
+            # SQLite can't return columns of the FROM tables, read it first
+            result = await db.execute(
+                select(BookDBModel.course_code).where(BookDBModel.id == book_id)
+            )
+            old_course_code = result.scalar_one_or_none()
+
+    result = await db.execute(stmt.returning(*returning))
+    updated_book = result.mappings().one_or_none()
     await db.commit()
-    
-    # Get the updated book
-    return await CRUDget_book(db, book_id)
+    if updated_book is None:
+        return None
+
+    old_course_code = updated_book.get("old_course_code", old_course_code)
+    updated_book = {column.key: updated_book[column.key] for column in BOOK_COLUMNS}
+    await _invalidate_book(book_id, old_course_code, updated_book["course_code"])
+    await get_search_engine().index_book(updated_book)
+    events = [book_updated_event(updated_book)]
+    if old_course_code and old_course_code != updated_book["course_code"]:
+        # Gone from the old course's stream, then shown in the new one
+        events.insert(0, book_deleted_event(book_id, old_course_code))
+    await publish_book_events(*events)
+    return updated_book
 
 async def CRUDget_books(db: Session, skip: int = 0, limit: int = 10):
     """Get a list of books with pagination"""
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).offset(skip).limit(limit)
+    stmt = _apply_sort(select(*BOOK_COLUMNS), "newest").offset(skip).limit(limit)
     result = await db.execute(stmt)
     return result.mappings().all()
 
+async def CRUDsearch_books(
+    db,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    course_code: Optional[str] = None,
+):
+    """Ranked search over title, author and description"""
+    return await get_search_engine().search(
+        db, query, BOOK_COLUMNS, limit=limit, offset=offset, course_code=course_code
+    )
+
 async def CRUDsearch_books_by_title(db: Session, query: str):
     """Search books by title (case-insensitive)"""
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).where(BookDBModel.title.ilike(f"%{query}%"))
-    result = await db.execute(stmt)
-    return result.mappings().all()
+    return await CRUDsearch_books(db, query)
 
 async def CRUDget_books_by_price_range(db: Session, min_price: int, max_price: int):
     """Get books within a specified price range"""
-    # Now include created_at field
-    stmt = select(
-        BookDBModel.id,
-        BookDBModel.title,
-        BookDBModel.author,
-        BookDBModel.price,
-        BookDBModel.description,
-        BookDBModel.condition,
-        BookDBModel.course_code,
-        BookDBModel.image_url,
-        BookDBModel.user_id,
-        BookDBModel.created_at
-    ).where(BookDBModel.price >= min_price, BookDBModel.price <= max_price)
+    stmt = select(*BOOK_COLUMNS).where(BookDBModel.price >= min_price, BookDBModel.price <= max_price)
     result = await db.execute(stmt)
     return result.mappings().all()
+
+async def CRUDstream_books(
+    course_code: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    title: Optional[str] = None,
+    batch_size: int = 1000,
+):
+    """
+    Yield every matching book in id order, batch_size rows at a time.
+
+    Reads through a server-side cursor on its own session, so memory stays
+    the same whatever the catalogue size and the caller can keep iterating
+    after the request's session is closed (e.g. in a StreamingResponse).
+    """
+    stmt = filtered_books_query(
+        select(*BOOK_COLUMNS), course_code, price_min, price_max, condition, title
+    ).order_by(BookDBModel.id).execution_options(yield_per=batch_size)
+
+    async with SessionLocal() as session:
+        result = await session.stream(stmt)
+        async for rows in result.mappings().partitions():
+            yield rows
@@ -0,0 +1,238 @@
+# Bulk listing import: a CSV or NDJSON manifest plus an optional zip of
+# images, for bookstores and student unions listing hundreds of books.
+#
+# Rows are checked first (fields through BookCreate, every course code in
+# one query, every image in the archive), then all valid rows go in with a
+# single INSERT in one transaction. Images are uploaded afterwards through
+# the shared ImageUploadQueue, so at most IMAGE_UPLOAD_CONCURRENCY of them
+# run at once and the request doesn't wait on them.
+import asyncio
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.crud.book import BOOK_COLUMNS, book_image_callback
+from app.crud.uploadImage import image_upload_queue, sniff_image_type
+from app.cache import invalidate
+from app.models.book import BookDBModel
+from app.models.course import CourseDBModel
+from app.schemas.book import BookCreate
+from app.search import get_search_engine
+from app.events import book_created_event, publish_book_events
+from app.alerts import queue_book_alerts
+
+MANIFEST_FIELDS = ("title", "author", "price", "description", "condition", "course_code", "image")
+
+# Keeps the background enqueue tasks alive until they are done
+_enqueue_tasks = set()
+
+
+async def parse_manifest(manifest: UploadFile):
+    """Read a CSV or NDJSON manifest into a list of dicts, one per row"""
+    raw = await manifest.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Manifest must be UTF-8")
+
+    name = (manifest.filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or manifest.content_type in (
+        "application/x-ndjson", "application/jsonl"
+    ):
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Line {number} is not valid JSON")
+            if not isinstance(row, dict):
+                raise HTTPException(status_code=400, detail=f"Line {number} is not a JSON object")
+            rows.append(row)
+    else:
+        # Values past the header end up under "(extra values)"
+        rows = list(csv.DictReader(io.StringIO(text), restkey="(extra values)"))
+
+    if not rows:
+        raise HTTPException(status_code=400, detail="Manifest is empty")
+    if len(rows) > settings.IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Manifest has more than {settings.IMPORT_MAX_ROWS} rows",
+        )
+    return rows
+
+
+def _extract_images(archive, names):
+    """
+    Copy the named images out of the zip into temp files.
+    Returns {name: (path, content_type)} and {name: error}.
+    """
+    extracted, errors = {}, {}
+    try:
+        zf = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Image archive is not a valid zip file")
+    try:
+        with zf:
+            members = {info.filename: info for info in zf.infolist() if not info.is_dir()}
+            for name in names:
+                info = members.get(name)
+                if info is None:
+                    errors[name] = "Image not found in archive"
+                    continue
+                if info.file_size > settings.IMAGE_MAX_BYTES:
+                    errors[name] = f"Image is larger than {settings.IMAGE_MAX_BYTES // (1024 * 1024)} MB"
+                    continue
+                path = None
+                try:
+                    with zf.open(info) as src:
+                        head = src.read(settings.IMAGE_CHUNK_SIZE)
+                        content_type = sniff_image_type(head)
+                        if content_type is None:
+                            errors[name] = "Unsupported image type"
+                            continue
+                        fd, path = tempfile.mkstemp(prefix="campusbooks-upload-")
+                        with os.fdopen(fd, "wb") as dst:
+                            dst.write(head)
+                            shutil.copyfileobj(src, dst, settings.IMAGE_CHUNK_SIZE)
+                # Encrypted member, unsupported compression, bad CRC or a
+                # corrupt stream: only the rows using this image fail
+                except (zipfile.BadZipFile, RuntimeError, NotImplementedError,
+                        zlib.error, EOFError) as e:
+                    if path is not None:
+                        os.remove(path)
+                    errors[name] = f"Could not read image from archive ({e})"
+                    continue
+                extracted[name] = (path, content_type)
+    except BaseException:
+        for path, _ in extracted.values():
+            os.remove(path)
+        raise
+    return extracted, errors
+
+
+async def _enqueue_images(jobs):
+    for book_id, path, content_type in jobs:
+        await image_upload_queue.enqueue(path, content_type, book_image_callback(book_id))
+
+
+async def CRUDimport_books(db, rows, archive, user_id):
+    """
+    Create books from manifest rows owned by user_id. archive is a file
+    object with the zip of images, or None. Returns the import report.
+    """
+    report = [{"row": number, "status": "error", "book_id": None, "errors": []}
+              for number in range(1, len(rows) + 1)]
+    books = {}
+    for index, row in enumerate(rows):
+        unknown = set(row) - set(MANIFEST_FIELDS)
+        if unknown:
+            report[index]["errors"].append(f"Unknown columns: {', '.join(sorted(unknown))}")
+            continue
+        errors = report[index]["errors"]
+        image = row.get("image")
+        if image is not None and not isinstance(image, str):
+            # NDJSON can hold any JSON value here
+            errors.append("image: must be a file name")
+        try:
+            book = BookCreate(**{k: v for k, v in row.items() if k != "image"})
+        except ValidationError as e:
+            errors += [
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()
+            ]
+            continue
+        if not errors:
+            books[index] = book
+
+    # Every course code in one query
+    codes = {book.course_code for book in books.values()}
+    result = await db.execute(select(CourseDBModel.code).where(CourseDBModel.code.in_(codes)))
+    known_codes = set(result.scalars().all())
+    for index, book in list(books.items()):
+        if book.course_code not in known_codes:
+            report[index]["errors"].append(f"Unknown course code {book.course_code}")
+            del books[index]
+
+    image_names = {index: rows[index].get("image") or None for index in books}
+    wanted = {name for name in image_names.values() if name}
+    if wanted and archive is None:
+        raise HTTPException(status_code=400, detail="Manifest names images but no archive was sent")
+    images, image_errors = {}, {}
+    if wanted:
+        images, image_errors = await asyncio.to_thread(_extract_images, archive, wanted)
+    for index, name in image_names.items():
+        if name in image_errors:
+            report[index]["errors"].append(f"{name}: {image_errors[name]}")
+            del books[index]
+
+    indexes = list(books)
+    created = []
+    jobs = []
+    try:
+        if indexes:
+            stmt = insert(BookDBModel).returning(*BOOK_COLUMNS, sort_by_parameter_order=True)
+            result = await db.execute(stmt, [
+                {
+                    **books[index].model_dump(),
+                    "user_id": user_id,
+                    "image_status": "pending" if image_names[index] else "ready",
+                }
+                for index in indexes
+            ])
+            # Plain dicts, the search index reads fields by key from those
+            created = [dict(book) for book in result.mappings().all()]
+            await db.commit()
+
+        used = set()
+        search_engine = get_search_engine()
+        for index, book in zip(indexes, created):
+            report[index].update(status="created", book_id=book["id"])
+            await search_engine.index_book(book)
+            name = image_names[index]
+            if name:
+                path, content_type = images[name]
+                if name in used:
+                    # Two rows with the same image each get their own copy
+                    fd, copy = tempfile.mkstemp(prefix="campusbooks-upload-")
+                    os.close(fd)
+                    jobs.append((book["id"], copy, content_type))
+                    shutil.copyfile(path, copy)
+                else:
+                    jobs.append((book["id"], path, content_type))
+                used.add(name)
+    except BaseException:
+        # Nothing was queued yet, every temp file is still ours
+        for path in {path for path, _ in images.values()} | {path for _, path, _ in jobs}:
+            os.remove(path)
+        raise
+    # Extracted images no row ended up using
+    for name, (path, _) in images.items():
+        if name not in used:
+            os.remove(path)
+
+    if created:
+        await invalidate("books", *{f"course:{book['course_code']}" for book in created})
+        await publish_book_events(*(book_created_event(book) for book in created))
+        await queue_book_alerts(*created)
+    if jobs:
+        task = asyncio.create_task(_enqueue_images(jobs))
+        _enqueue_tasks.add(task)
+        task.add_done_callback(_enqueue_tasks.discard)
+
+    return {
+        "created": len(created),
+        "failed": len(rows) - len(created),
+        "rows": report,
+    }
@@ -3,6 +3,69 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.course import CourseDBModel
 from app.schemas.course import CourseCreate
+import asyncio
+import gzip
+import hashlib
+import json
+
+
+class CourseCatalog:
+    """
+    In-memory copy of the course list.
+
+    The JSON body (plain and gzipped) and its ETag are built once when the
+    catalog is loaded, so serving /course_codes/ is just returning bytes.
+    Call invalidate() whenever courses are added and the next request will
+    rebuild it.
+    """
+
+    def __init__(self):
+        self.codes = frozenset()
+        self.body = b"[]"
+        self.gzip_body = gzip.compress(self.body)
+        self.etag = None
+        self.version = 0
+        self._loaded = False
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def build(self, codes):
+        codes = sorted(codes)
+        # Same encoding as FastAPI's JSONResponse so the output is unchanged
+        body = json.dumps(
+            [{"code": code} for code in codes],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+        self.codes = frozenset(codes)
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9)
+        self.version += 1
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self._loaded = True
+
+    async def load(self, db):
+        """Load the catalog from the database unless it is already loaded"""
+        if self._loaded:
+            return self
+        async with self._lock:
+            if not self._loaded:
+                generation = self._generation
+                result = await db.execute(select(CourseDBModel.code))
+                self.build(result.scalars().all())
+                # Invalidated while we were reading, load again next time
+                if generation != self._generation:
+                    self._loaded = False
+        return self
+
+    def invalidate(self):
+        self._generation += 1
+        self._loaded = False
+
+
+course_catalog = CourseCatalog()
+
 
 async def CRUDcreate_course(db, course: CourseCreate):
     """Create a course if it doesn't already exist"""
@@ -16,6 +79,7 @@ async def CRUDcreate_course(db, course: CourseCreate):
     db.add(db_course)
     await db.commit()
     await db.refresh(db_course)
+    course_catalog.invalidate()
     return db_course
 
 async def CRUDget_courses(db):
@@ -27,4 +91,17 @@ async def CRUDget_course(db, code: str):
     """Get a course by its code"""
     query = select(CourseDBModel).where(CourseDBModel.code == code)
     result = await db.execute(query)
-    return result.scalar_one_or_none()
\ No newline at end of file
+    return result.scalar_one_or_none()
+
+async def CRUDget_course_catalog(db):
+    """Get the cached course catalog, loading it on first use"""
+    return await course_catalog.load(db)
+
+async def CRUDget_course_version(db, code: str):
+    """
+    Get (version, updated_at) for a course, or None if it doesn't exist.
+    The version changes whenever a book in the course changes.
+    """
+    stmt = select(CourseDBModel.version, CourseDBModel.updated_at).where(CourseDBModel.code == code)
+    result = await db.execute(stmt)
+    return result.one_or_none()
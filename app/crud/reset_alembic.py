@@ -3,7 +3,6 @@ Script to reset the alembic_version table so we can start fresh with migrations.
 """
 from sqlalchemy import create_engine, text
 import os
-from dotenv import load_dotenv
 import sys
 import os
 
@@ -11,11 +10,10 @@ import os
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 sys.path.insert(0, parent_dir)
 
-# Load environment variables
-load_dotenv()
+from app.core.config import settings
 
-# Get database URL from environment variable
-database_url = os.getenv("DATABASE_URL")
+# Get database URL from settings (which also reads .env)
+database_url = settings.DATABASE_URL
 if database_url and database_url.startswith("postgresql+asyncpg"):
     # Convert to synchronous version for this script
     database_url = database_url.replace("postgresql+asyncpg", "postgresql")
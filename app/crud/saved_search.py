@@ -0,0 +1,72 @@
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, func
+from app.alerts import saved_search_matcher
+from app.core.config import settings
+from app.models.course import CourseDBModel
+from app.models.saved_search import SavedSearchDBModel
+from app.schemas.saved_search import SavedSearchCreate
+
+SAVED_SEARCH_COLUMNS = (
+    SavedSearchDBModel.id,
+    SavedSearchDBModel.user_id,
+    SavedSearchDBModel.course_code,
+    SavedSearchDBModel.price_max,
+    SavedSearchDBModel.condition,
+    SavedSearchDBModel.title_words,
+    SavedSearchDBModel.created_at,
+)
+
+
+async def CRUDcreate_saved_search(db, search: SavedSearchCreate, user_id):
+    """Save a search for user_id and start matching new books against it"""
+    result = await db.execute(
+        select(func.count()).select_from(SavedSearchDBModel)
+        .where(SavedSearchDBModel.user_id == user_id)
+    )
+    if result.scalar_one() >= settings.SAVED_SEARCH_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"You can have at most {settings.SAVED_SEARCH_LIMIT} saved searches",
+        )
+    if search.course_code:
+        result = await db.execute(
+            select(CourseDBModel.code).where(CourseDBModel.code == search.course_code)
+        )
+        if result.first() is None:
+            raise HTTPException(status_code=400, detail="Unknown course code")
+
+    stmt = (
+        insert(SavedSearchDBModel)
+        .values(**search.model_dump(), user_id=user_id)
+        .returning(*SAVED_SEARCH_COLUMNS)
+    )
+    result = await db.execute(stmt)
+    saved = dict(result.mappings().one())
+    await db.commit()
+    saved_search_matcher.add(saved)
+    return saved
+
+async def CRUDget_saved_searches(db, user_id):
+    """Saved searches of a user, oldest first"""
+    stmt = (
+        select(*SAVED_SEARCH_COLUMNS)
+        .where(SavedSearchDBModel.user_id == user_id)
+        .order_by(SavedSearchDBModel.id)
+    )
+    result = await db.execute(stmt)
+    return result.mappings().all()
+
+async def CRUDdelete_saved_search(db, search_id: int, user_id):
+    """Delete one of user_id's saved searches, False if there is no such search"""
+    stmt = (
+        delete(SavedSearchDBModel)
+        .where(SavedSearchDBModel.id == search_id, SavedSearchDBModel.user_id == user_id)
+        .returning(SavedSearchDBModel.id)
+    )
+    result = await db.execute(stmt)
+    deleted = result.first()
+    await db.commit()
+    if deleted is None:
+        return False
+    saved_search_matcher.remove(search_id)
+    return True
@@ -1,19 +1,249 @@
-import cloudinary.uploader
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
 from fastapi import UploadFile, HTTPException
+from app.core.config import settings
+from app.storage import get_storage
+from app.storage.variants import process_image
 
-async def upload_to_cloudinary(image: UploadFile) -> str:
+
+def sniff_image_type(head: bytes):
+    """Content type of an image from its first bytes, None if not an image we accept"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
+
+
+async def spool_upload(image: UploadFile, max_size: int = None, chunk_size: int = None):
+    """
+    Copy an uploaded image to a temp file, one chunk at a time.
+
+    The type is checked on the first chunk and the size on every chunk, so
+    bad uploads are rejected before the rest is read. Returns
+    (path, content_type); the caller owns the temp file.
+    """
+    max_size = max_size or settings.IMAGE_MAX_BYTES
+    chunk_size = chunk_size or settings.IMAGE_CHUNK_SIZE
+
+    fd, path = tempfile.mkstemp(prefix="campusbooks-upload-")
     try:
-        contents = await image.read()
-        result = cloudinary.uploader.upload(
-            contents,
-            folder="marketplace_images",
-            transformation=[
-                {"width": 300, "height": 500, "crop": "fill", "gravity": "auto"}
-            ]
+        size = 0
+        content_type = None
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await image.read(chunk_size):
+                if content_type is None:
+                    content_type = sniff_image_type(chunk)
+                    if content_type is None:
+                        raise HTTPException(status_code=415, detail="Unsupported image type")
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Image is larger than {max_size // (1024 * 1024)} MB",
+                    )
+                f.write(chunk)
+        if content_type is None:
+            raise HTTPException(status_code=400, detail="Image is empty")
+        return path, content_type
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+class ImageUploadQueue:
+    """
+    Runs image uploads in the background so requests don't wait on them.
+
+    Jobs go into a bounded queue (enqueue waits when it is full) and a fixed
+    number of workers hand them to the storage backend in a thread pool, so
+    at most `concurrency` uploads run at once and the event loop is never
+    blocked. Failed uploads are retried with exponential backoff.
+
+    Before it is stored each image goes through process_image, which
+    re-encodes it upright and without metadata (EXIF, GPS position) and
+    resizes it to variant_widths in WebP and JPEG. That runs in a pool of
+    process_workers processes, so decoding and encoding use other cores
+    instead of holding the GIL (in the upload threads with 0 workers). The
+    clean copy is stored instead of the upload and the variants next to
+    it. An image Pillow can't read (HEIC) is stored as uploaded, without
+    variants; one with more than max_pixels pixels is rejected ("failed").
+
+    When a job finishes, on_complete is awaited with (image_url, status,
+    variants) where status is "ready" or "failed" and variants is a list of
+    {"width", "format", "url"} dicts, and the temp files are removed.
+
+    Jobs only live in memory, a worker restart loses the queued ones and
+    those books stay "pending".
+    """
+
+    def __init__(self, storage=None, concurrency: int = 4, retries: int = 3,
+                 max_queued: int = 100, backoff: float = 1.0, process_workers: int = 0,
+                 variant_widths=(), variant_quality: int = 80,
+                 max_pixels: int = 50_000_000):
+        self.storage = storage
+        self.concurrency = concurrency
+        self.retries = retries
+        self.max_queued = max_queued
+        self.backoff = backoff
+        self.process_workers = process_workers
+        self.variant_widths = list(variant_widths)
+        self.variant_quality = variant_quality
+        self.max_pixels = max_pixels
+        self._queue = None
+        self._workers = []
+        self._executor = None
+        self._processes = None
+
+    def _start(self):
+        if self.storage is None:
+            self.storage = get_storage()
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="image-upload"
+        )
+        if self.process_workers:
+            self._start_processes()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    def _start_processes(self):
+        # spawn, not fork: forking a process with an event loop and the
+        # upload threads running is not safe
+        self._processes = ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context("spawn"),
         )
-        url = result.get("secure_url")
-        if not url:
-            raise HTTPException(status_code=500, detail="Cloudinary upload failed")
-        return url
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
\ No newline at end of file
+
+    async def enqueue(self, path: str, content_type: str, on_complete):
+        """Queue the upload of a spooled file, waits if too many are already queued"""
+        if self._queue is None:
+            self._start()
+        await self._queue.put((path, content_type, on_complete))
+
+    async def _process(self, path: str):
+        """Run process_image on the spooled file, None if it can't be read"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._processes or self._executor, process_image, path,
+                self.variant_widths, self.variant_quality, self.max_pixels,
+            )
+        except Image.DecompressionBombError:
+            # Not stored at all, the book's image ends up "failed"
+            raise
+        except BrokenProcessPool:
+            # A worker died (out of memory on a huge image?), the pool is
+            # unusable from now on so start a new one
+            print("Image process pool broke, restarting it")
+            self._processes.shutdown(wait=False)
+            self._start_processes()
+        except Exception as e:
+            print(f"Could not process image, storing it as uploaded: {e}")
+        return None
+
+    async def _upload_with_retries(self, path: str, content_type: str,
+                                   transform: bool = True) -> str:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                return await loop.run_in_executor(
+                    self._executor, self.storage.save, path, content_type, transform
+                )
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"Image upload failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _upload_variant(self, variant: dict):
+        try:
+            url = await self._upload_with_retries(
+                variant["path"], variant["content_type"], transform=False
+            )
+        except Exception as e:
+            # The book still has its original image
+            print(f"Image variant upload gave up: {e}")
+            return None
+        return {"width": variant["width"], "format": variant["format"], "url": url}
+
+    async def _worker(self):
+        while True:
+            path, content_type, on_complete = await self._queue.get()
+            processed = None
+            try:
+                try:
+                    processed = await self._process(path)
+                    original = {"path": path, "content_type": content_type}
+                    variants = []
+                    if processed is not None:
+                        original = processed["original"]
+                        variants = processed["variants"]
+                    # Wait for every upload before the files are removed,
+                    # even when the original fails
+                    url, *uploaded = await asyncio.gather(
+                        self._upload_with_retries(original["path"], original["content_type"]),
+                        *(self._upload_variant(variant) for variant in variants),
+                        return_exceptions=True,
+                    )
+                    if isinstance(url, Exception):
+                        raise url
+                    await on_complete(url, "ready", [v for v in uploaded if v is not None])
+                except Exception as e:
+                    print(f"Image upload gave up: {e}")
+                    await on_complete(None, "failed", [])
+            except Exception as e:
+                print(f"Storing image upload result failed: {e}")
+            finally:
+                os.remove(path)
+                if processed is not None:
+                    os.remove(processed["original"]["path"])
+                    for variant in processed["variants"]:
+                        os.remove(variant["path"])
+                self._queue.task_done()
+
+    async def join(self):
+        """Wait until every queued upload has finished"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, timeout: float = 30):
+        """Let queued uploads finish (up to timeout) and stop the workers"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print("Gave up waiting for image uploads on shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        self._executor.shutdown(wait=False)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+        self._queue = None
+        self._workers = []
+
+
+image_upload_queue = ImageUploadQueue(
+    concurrency=settings.IMAGE_UPLOAD_CONCURRENCY,
+    retries=settings.IMAGE_UPLOAD_RETRIES,
+    max_queued=settings.IMAGE_UPLOAD_QUEUE_SIZE,
+    process_workers=settings.IMAGE_PROCESS_WORKERS,
+    variant_widths=settings.IMAGE_VARIANT_WIDTHS,
+    variant_quality=settings.IMAGE_VARIANT_QUALITY,
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+)
@@ -1,22 +1,29 @@
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional
 import os
-# get env key
-from dotenv import load_dotenv
+import jwt
 from fastapi import Depends, Request
-from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
+from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin, exceptions
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
     JWTStrategy,
 )
 from fastapi_users.db import SQLAlchemyUserDatabase
+from fastapi_users.jwt import decode_jwt
 
 from app.userDB import User, get_user_db
+from app.core.config import settings
+from app.cache.users import UserSnapshotCache
+from app.alerts import saved_search_matcher
 
-load_dotenv()
-# grab secret key from env
-SECRET = os.getenv("SECRET")
+SECRET = settings.SECRET
+
+user_cache = UserSnapshotCache(
+    User,
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL,
+)
 
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
@@ -36,6 +43,24 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     ):
         print(f"Verification requested for user {user.id}. Verification token: {token}")
 
+    # Drop cached snapshots whenever the user row changes (this covers
+    # deactivation, which is an update of is_active)
+    async def on_after_update(
+        self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None
+    ):
+        user_cache.invalidate_user(user.id)
+
+    async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate_user(user.id)
+
+    async def on_after_reset_password(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate_user(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate_user(user.id)
+        # The database drops their saved searches with the user
+        saved_search_matcher.remove_user(user.id)
+
 
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
     yield UserManager(user_db)
@@ -44,8 +69,41 @@ async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 
 
+class CachedJWTStrategy(JWTStrategy):
+    """JWTStrategy that remembers the user behind each verified token"""
+
+    async def read_token(self, token: Optional[str], user_manager: BaseUserManager):
+        if token is None:
+            return None
+
+        user = user_cache.get(token)
+        if user is not None:
+            return user
+
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+            user_id = data.get("sub")
+            if user_id is None:
+                return None
+        except jwt.PyJWTError:
+            return None
+
+        try:
+            user = await user_manager.get(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+        user_cache.set(token, user, token_expires_at=data.get("exp"))
+        return user
+
+
+# Built once, the strategy holds no per-request state
+jwt_strategy = CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600*24)
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET, lifetime_seconds=3600*24)
+    return jwt_strategy
 
 
 auth_backend = AuthenticationBackend(
@@ -57,3 +115,6 @@ auth_backend = AuthenticationBackend(
 fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [auth_backend])
 
 current_active_user = fastapi_users.current_user(active=True)
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+# None instead of 401 for anonymous requests
+current_optional_user = fastapi_users.current_user(active=True, optional=True)
@@ -1,17 +1,15 @@
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import time
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 import os
-from dotenv import load_dotenv
 import json
 
 # Adjust the import path based on your project structure
+from app.database import engine
 from app.models.course import CourseDBModel
+from app.crud.course import course_catalog
 
-#import database url from .env
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
 #import from coursecodes.json in same folder
 
 FIXED_COURSE_CODES_FILE = os.path.join(os.path.dirname(__file__), "coursecodes.json")
@@ -21,43 +19,60 @@ with open(FIXED_COURSE_CODES_FILE, 'r') as f:
     FIXED_COURSE_CODES = json.load(f)
 # -----------------------------------------
 
-async def seed_data():
-    print(f"Connecting to database: {DATABASE_URL}")
-    engine = create_async_engine(DATABASE_URL, echo=False) # Set echo=True for debugging SQL
-    AsyncSessionFactory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
-    async with AsyncSessionFactory() as session:
-        async with session.begin(): # Use begin() for transaction management
-            print(f"Seeding {len(FIXED_COURSE_CODES)} course codes...")
-            added_count = 0
-            skipped_count = 0
-
-            for code in FIXED_COURSE_CODES:
-                # Check if the course code already exists - use 'code' column name instead of 'course_code'
-                result = await session.execute(
-                    select(CourseDBModel).filter_by(code=code)
-                )
-                existing_course = result.scalars().first()
-
-                if existing_course:
-                    skipped_count += 1
-                else:
-                    # Create and add the new course code - use 'code' instead of 'course_code'
-                    new_course = CourseDBModel(code=code)
-                    session.add(new_course)
-                    added_count += 1
-
-            print(f"Finished seeding. Added: {added_count}, Skipped (already exist): {skipped_count}")
-        # Session is automatically committed here if no exceptions occurred
-        # Or rolled back if an exception happened within the 'async with session.begin():' block
-
-    await engine.dispose() # Clean up the engine connection pool
-    print("Database connection closed.")
+# Rows per INSERT, keeps us well under the bind parameter limits
+SEED_CHUNK_SIZE = 1000
+
+
+def _insert_ignore_duplicates(dialect_name: str):
+    """INSERT ... ON CONFLICT DO NOTHING for the current database"""
+    if dialect_name == "postgresql":
+        return postgresql.insert(CourseDBModel).on_conflict_do_nothing(index_elements=["code"])
+    if dialect_name == "sqlite":
+        return sqlite.insert(CourseDBModel).on_conflict_do_nothing(index_elements=["code"])
+    raise ValueError(f"Seeding is not supported on {dialect_name}")
+
+
+async def seed_data(course_codes=None):
+    """
+    Insert every course code that is not in the database yet.
+
+    Existing codes are read in one query and only the missing ones are sent,
+    so re-running with a grown coursecodes.json just inserts the new codes.
+    ON CONFLICT DO NOTHING keeps it safe when several processes seed at once.
+    Returns a dict with added, skipped and elapsed (seconds).
+    """
+    if course_codes is None:
+        course_codes = FIXED_COURSE_CODES
+
+    started = time.perf_counter()
+    wanted = set(course_codes)
+    print(f"Seeding {len(wanted)} course codes...")
+
+    async with engine.begin() as conn:
+        result = await conn.execute(select(CourseDBModel.code))
+        existing = set(result.scalars().all())
+        missing = sorted(wanted - existing)
+
+        added_count = 0
+        insert_stmt = _insert_ignore_duplicates(conn.dialect.name).returning(CourseDBModel.code)
+        for start in range(0, len(missing), SEED_CHUNK_SIZE):
+            chunk = missing[start:start + SEED_CHUNK_SIZE]
+            result = await conn.execute(insert_stmt.values([{"code": code} for code in chunk]))
+            added_count += len(result.all())
+
+    skipped_count = len(wanted) - added_count
+    elapsed = time.perf_counter() - started
+    print(f"Finished seeding. Added: {added_count}, Skipped (already exist): {skipped_count}, "
+          f"took {elapsed:.3f}s")
+
+    if added_count:
+        # New courses, rebuild the served catalog on next request
+        course_catalog.invalidate()
+
+    return {"added": added_count, "skipped": skipped_count, "elapsed": elapsed}
 
 if __name__ == "__main__":
-    # Load environment variables (like DATABASE_URL) if needed
-    # Adjust the path to your .env file if it's not in the backend root
-    load_dotenv(dotenv_path="../.env")
+    # DATABASE_URL comes from settings, which loads .env
     print("Running course seeding script...")
     asyncio.run(seed_data())
     print("Script finished.")
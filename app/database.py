@@ -1,23 +1,135 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.engine import make_url
+from sqlalchemy import event, exc
+from app.core.config import settings
+import bisect
 import os
-
-# Load environment variables
-load_dotenv()
+import time
 
 # Validate DATABASE_URL exists
 SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+
+class PoolStats:
+    """Checkout counters and a latency histogram for one worker's pool"""
+
+    # Upper bounds (seconds) of the checkout latency buckets
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # one count per bucket plus one for slower than the last bucket
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+
+    def observe(self, seconds: float):
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        self.histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    def as_dict(self) -> dict:
+        labels = [f"le_{bound}" for bound in self.BUCKETS] + ["le_inf"]
+        return {
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "checkout_latency": dict(zip(labels, self.histogram)),
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts take and how many are waiting"""
+
+    stats = PoolStats()
+
+    def connect(self):
+        self.stats.waiting += 1
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.waiting -= 1
+            self.stats.observe(time.perf_counter() - started)
+
+
+def _engine_options(url: str) -> dict:
+    """Pool and driver options from settings, per database backend"""
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        # SQLite picks its own pool, none of the sizing applies
+        return {}
+
+    options = {
+        "poolclass": InstrumentedPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING == "always",
+    }
+    if make_url(url).get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            # asyncpg's prepared statement cache, set to 0 behind pgbouncer
+            # in transaction mode
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
+
 # Create async SQLAlchemy engine
 engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
     echo=False,
-    pool_pre_ping=True,
+    **_engine_options(SQLALCHEMY_DATABASE_URL),
 )
 
+if settings.DB_POOL_PRE_PING == "idle":
+    # Only ping connections that sat in the pool long enough to have been
+    # dropped, instead of paying a round trip on every checkout
+    @event.listens_for(engine.sync_engine.pool, "checkin")
+    def _record_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine.pool, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < settings.DB_POOL_PING_IDLE:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            # The pool throws the connection away and checks out another one
+            raise exc.DisconnectionError()
+
+
+def get_pool_stats() -> dict:
+    """Current state of this worker's connection pool"""
+    pool = engine.sync_engine.pool
+    stats = {"pid": os.getpid(), "pool": pool.__class__.__name__}
+    if isinstance(pool, InstrumentedPool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            **pool.stats.as_dict(),
+        })
+    return stats
+
 # Create async session class
 SessionLocal = async_sessionmaker(
     engine,
@@ -33,4 +145,3 @@ async def get_db():
             yield session
         finally:
             await session.close()
-
@@ -0,0 +1,61 @@
+# Listing events for GET /books/stream. Postgres shares them between
+# workers with LISTEN/NOTIFY, everything else (SQLite in tests/dev) only
+# has the in-process pub/sub.
+from collections.abc import Mapping
+
+import orjson
+
+from app.core.config import settings
+from app.database import engine
+from app.events.broker import OVERFLOW, MemoryEventBroker, Subscription
+from app.events.postgres import PostgresEventBroker
+from app.schemas.serialization import BOOK_API_FIELDS
+
+_broker = None
+
+
+def get_event_broker():
+    """Return the event broker matching the configured database"""
+    global _broker
+    if _broker is None:
+        options = {
+            "max_queued": settings.STREAM_QUEUE_SIZE,
+            "max_subscribers": settings.STREAM_MAX_SUBSCRIBERS,
+        }
+        if engine.dialect.name == "postgresql":
+            _broker = PostgresEventBroker(settings.DATABASE_URL, **options)
+        else:
+            _broker = MemoryEventBroker(**options)
+    return _broker
+
+
+def _book_fields(book):
+    if isinstance(book, Mapping):
+        return {name: book[name] for name in BOOK_API_FIELDS}
+    return {name: getattr(book, name) for name in BOOK_API_FIELDS}
+
+
+def book_created_event(book):
+    """(course_code, event_type, payload) for a new listing, book is a row or a model"""
+    fields = _book_fields(book)
+    payload = {"type": "created", "book_id": fields["id"],
+               "course_code": fields["course_code"], "book": fields}
+    return fields["course_code"], "created", orjson.dumps(payload, option=orjson.OPT_UTC_Z)
+
+
+def book_updated_event(book):
+    """(course_code, event_type, payload) for a changed listing, with the whole book"""
+    fields = _book_fields(book)
+    payload = {"type": "updated", "book_id": fields["id"],
+               "course_code": fields["course_code"], "book": fields}
+    return fields["course_code"], "updated", orjson.dumps(payload, option=orjson.OPT_UTC_Z)
+
+
+def book_deleted_event(book_id: int, course_code):
+    """(course_code, event_type, payload) for a removed listing"""
+    payload = {"type": "deleted", "book_id": book_id, "course_code": course_code}
+    return course_code, "deleted", orjson.dumps(payload)
+
+
+async def publish_book_events(*events):
+    await get_event_broker().publish(events)
@@ -0,0 +1,104 @@
+import asyncio
+from collections import defaultdict
+from typing import Optional
+
+# Put in a subscriber's queue when it fell too far behind, the stream ends
+# and the client reconnects (and refetches) instead of buffering forever
+OVERFLOW = object()
+
+
+def sse_frame(event_type: str, payload: bytes) -> bytes:
+    """A Server-Sent Events message"""
+    return b"event: " + event_type.encode() + b"\ndata: " + payload + b"\n\n"
+
+
+class Subscription:
+    """One listener with a bounded queue of encoded SSE messages"""
+
+    def __init__(self, broker, course_code: Optional[str], max_queued: int):
+        self.broker = broker
+        self.course_code = course_code
+        self.max_queued = max_queued
+        # One spare slot for the OVERFLOW marker
+        self.queue = asyncio.Queue(maxsize=max_queued + 1)
+        self.closed = False
+
+    def put(self, frame: bytes):
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.max_queued:
+            self.close()
+            return
+        self.queue.put_nowait(frame)
+
+    def close(self):
+        """Stop the subscription, get() returns OVERFLOW once the queue is read"""
+        if self.closed:
+            return
+        self.closed = True
+        self.broker.unsubscribe(self)
+        self.queue.put_nowait(OVERFLOW)
+
+    async def get(self, timeout: float):
+        """Next message, None after timeout seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MemoryEventBroker:
+    """
+    In-process pub/sub for book events.
+
+    Subscribers register for one course (or all of them with None) and
+    every published event is put in the queue of each matching one.
+    Used on its own for SQLite and tests; PostgresEventBroker reuses the
+    fan-out and only changes how events get here.
+    """
+
+    def __init__(self, max_queued: int = 100, max_subscribers: int = 1000):
+        self.max_queued = max_queued
+        self.max_subscribers = max_subscribers
+        # course code (or None for every course) -> subscriptions
+        self._subscribers = defaultdict(set)
+        self._count = 0
+
+    def subscribe(self, course_code: Optional[str] = None) -> Optional[Subscription]:
+        """A new subscription, None if this worker already has too many"""
+        if self._count >= self.max_subscribers:
+            return None
+        subscription = Subscription(self, course_code, self.max_queued)
+        self._subscribers[course_code].add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.course_code)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self._count -= 1
+            if not subscribers:
+                del self._subscribers[subscription.course_code]
+
+    def dispatch(self, course_code: Optional[str], event_type: str, payload: bytes):
+        """Hand an event to everyone listening for its course"""
+        # Encoded once, whatever the number of subscribers
+        frame = sse_frame(event_type, payload)
+        keys = (course_code, None) if course_code is not None else (None,)
+        for key in keys:
+            for subscription in list(self._subscribers.get(key, ())):
+                subscription.put(frame)
+
+    async def publish(self, events):
+        """Publish (course_code, event_type, payload) events"""
+        for course_code, event_type, payload in events:
+            self.dispatch(course_code, event_type, payload)
+
+    async def stop(self):
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+
+    def __len__(self):
+        return self._count
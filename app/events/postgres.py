@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.events.broker import MemoryEventBroker
+
+CHANNEL = "book_events"
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD = 7900
+
+
+class PostgresEventBroker(MemoryEventBroker):
+    """
+    Book events shared by every worker through LISTEN/NOTIFY.
+
+    Each worker keeps one dedicated asyncpg connection (outside the
+    SQLAlchemy pool) that LISTENs on the channel and feeds the in-process
+    fan-out, so the number of subscribers never changes the number of
+    database connections. Publishing is one NOTIFY per batch of events,
+    sent on the same connection.
+    """
+
+    def __init__(self, database_url: str, max_queued: int = 100, max_subscribers: int = 1000):
+        super().__init__(max_queued=max_queued, max_subscribers=max_subscribers)
+        url = make_url(database_url).set(drivername="postgresql")
+        self.dsn = url.render_as_string(hide_password=False)
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self):
+        if self._conn is not None and not self._conn.is_closed():
+            return self._conn
+        async with self._lock:
+            if self._conn is None or self._conn.is_closed():
+                conn = await asyncpg.connect(self.dsn)
+                conn.add_termination_listener(self._on_connection_lost)
+                await conn.add_listener(CHANNEL, self._on_notify)
+                self._conn = conn
+        return self._conn
+
+    def _on_notify(self, connection, pid, channel, payload):
+        event = json.loads(payload)
+        self.dispatch(event.get("course_code"), event["type"], payload.encode())
+
+    def _on_connection_lost(self, connection):
+        # Events sent while we were gone are lost, end every stream so the
+        # clients reconnect and refetch. The next subscribe or publish
+        # opens a new connection.
+        print("Book event connection lost, closing subscriptions")
+        self._conn = None
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+
+    def subscribe(self, course_code=None):
+        subscription = super().subscribe(course_code)
+        if subscription is not None and self._conn is None:
+            # Start listening in the background, the first events of a
+            # fresh worker may arrive before the connection is up
+            asyncio.create_task(self._connect_quietly())
+        return subscription
+
+    async def _connect_quietly(self):
+        try:
+            await self._connection()
+        except Exception as e:
+            print(f"Could not open the book event connection: {e}")
+
+    async def publish(self, events):
+        payloads = []
+        for course_code, event_type, payload in events:
+            if len(payload) > MAX_PAYLOAD:
+                # Too big for NOTIFY (long description), send the ids only
+                # and let clients fetch the book
+                event = json.loads(payload)
+                event.pop("book", None)
+                payload = json.dumps(event, separators=(",", ":")).encode()
+            payloads.append(payload.decode())
+        if not payloads:
+            return
+        try:
+            conn = await self._connection()
+            async with self._lock:
+                await conn.execute(
+                    "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                    CHANNEL, payloads,
+                )
+        except Exception as e:
+            # The write already committed, a lost event only means
+            # subscribers see the change on their next fetch
+            print(f"Publishing book events failed: {e}")
+
+    async def stop(self):
+        await super().stop()
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
@@ -1,3 +1,6 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -5,19 +8,18 @@ from app.models import *  # This will import all models in the correct order
 
 from app.routes import books
 from app.routes import courses
-from app.database import Base
-from app.userDB import create_db_and_tables
+from app.routes import internal
+from app.routes import saved_searches
 from app.database import engine
-from dotenv import load_dotenv
 import os 
 import cloudinary
 from app.core.config import settings
 from fastapi import Depends
 from app.schemas.users import UserCreate, UserRead, UserUpdate
 from app.crud.users import auth_backend, current_active_user, fastapi_users
-from app.middleware.rate_limiter import RateLimitMiddleware
-
-load_dotenv()
+from app.middleware.rate_limiter import RateLimitMiddleware, get_rate_limit_backend
+from app.middleware.sql_timing import SQLTimingMiddleware, install_query_instrumentation
+from app.middleware.startup_timing import StartupTimingMiddleware, report_import_time
 
 # Configure cloudinary using settings from config
 cloudinary.config(
@@ -47,14 +49,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read pagination headers
+    expose_headers=["X-Next-Cursor", "X-Has-More", "X-Total-Count", "X-Total-Count-Exact", "ETag"],
 )
 
 # Add the Rate Limit middleware AFTER CORS but BEFORE routers
 # Limit critical paths like auth and resource creation
 app.add_middleware(
     RateLimitMiddleware,
-    limit=30,  
-    window=60, # Window in seconds (1 minute)
+    limit=settings.RATE_LIMIT,  
+    window=settings.RATE_LIMIT_WINDOW, # Window in seconds (1 minute by default)
     # List of paths to target for rate limiting:
     target_paths=[
         "/auth/register",
@@ -64,40 +68,45 @@ app.add_middleware(
         "/auth/request-verify-token",
         "/auth/verify",
         "/books/",
+        "/books/import",
         "/users/me",
         "/users/",
-    ]
+    ],
+    backend=get_rate_limit_backend(settings),
+    secret=settings.SECRET,
+    trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
 )
 
-# startup events
-from app.data.coursedata import seed_data
-
-@app.on_event("startup")
-async def startup():
-    try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        await create_db_and_tables()
-        print("Database setup complete")
-        
-        # Seed data in background after startup
-        import asyncio
-        asyncio.create_task(seed_data_background())
-        
-    except Exception as e:
-        print(f"Database already initialized: {e}")
-
-async def seed_data_background():
-    try:
-        print("Starting background course seeding...")
-        await seed_data()
-        print("Course seeding completed")
-    except Exception as e:
-        print(f"Background seeding failed: {e}")
-    
-    
+if settings.SQL_TIMING:
+    # Outermost, so the app timing covers the whole request
+    install_query_instrumentation(engine, slow_query_ms=settings.SLOW_QUERY_MS)
+    app.add_middleware(SQLTimingMiddleware)
+
+# Schema migrations and course seeding run once per deploy in the release
+# phase (python -m app.release), workers boot without touching the schema
+from app.crud.uploadImage import image_upload_queue
+from app.events import get_event_broker
+from app.alerts import alert_queue
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Give in-flight image uploads a chance to finish
+    await image_upload_queue.stop()
+    # End open /books/stream responses and the LISTEN connection
+    await get_event_broker().stop()
+    # Send the alerts still waiting for their batch
+    await alert_queue.stop()
+
+if settings.IMAGE_STORAGE == "local":
+    # Serve locally stored images, only meant for development
+    from fastapi.staticfiles import StaticFiles
+    os.makedirs(settings.IMAGE_LOCAL_DIR, exist_ok=True)
+    app.mount(settings.IMAGE_LOCAL_URL, StaticFiles(directory=settings.IMAGE_LOCAL_DIR), name="media")
+
 app.include_router(books.router)
 app.include_router(courses.router)
+app.include_router(internal.router)
+app.include_router(saved_searches.router)
 
 #userauth 
 
@@ -137,4 +146,7 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "campusbooks-backend"}
 
-
+if settings.STARTUP_TIMING:
+    # Outermost, added last
+    app.add_middleware(StartupTimingMiddleware, import_started=_import_started)
+    report_import_time(_import_started)
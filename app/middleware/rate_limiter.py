@@ -1,42 +1,171 @@
-# filepath: c:\Users\Kristoffer Khalaf\Desktop\newTry\ChalmerShelf\backend\app\middleware\rate_limiter.py
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 import time
-from collections import defaultdict
-from typing import List # Import List
+from collections import OrderedDict
+from typing import List
+
+import jwt
+from starlette.responses import Response
+from fastapi_users.jwt import decode_jwt
+
+
+class MemoryRateLimitBackend:
+    """
+    Token buckets kept in this process.
+
+    A bucket that has been idle for a whole window is full again, which is
+    the same as not having one, so idle buckets are dropped. max_keys caps
+    memory even under a flood of distinct clients.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time), oldest access first
+        self._buckets = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window: int):
+        """Take a token, returns (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        rate = limit / window
+        self._evict_idle(now, window)
+
+        tokens, last = self._buckets.pop(key, (limit, now))
+        tokens = min(limit, tokens + (now - last) * rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            allowed, retry_after = True, 0
+        else:
+            self._buckets[key] = (tokens, now)
+            allowed, retry_after = False, (1 - tokens) / rate
+
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def _evict_idle(self, now: float, window: int):
+        while self._buckets:
+            key, (_, last) = next(iter(self._buckets.items()))
+            if now - last < window:
+                break
+            del self._buckets[key]
+
+
+# Token bucket in Redis, run as a script so check-and-take is atomic
+TOKEN_BUCKET_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local rate = limit / window
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or limit
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], window)
+if allowed == 1 then
+    return {1, '0'}
+end
+return {0, tostring((1 - tokens) / rate)}
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    Token buckets shared by every worker through Redis, so the limit holds
+    for the whole app and not per process. Needs the optional redis package.
+    """
+
+    def __init__(self, url: str, prefix: str = "campusbooks:ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the 'redis' package installed")
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def hit(self, key: str, limit: int, window: int):
+        allowed, retry_after = await self._script(
+            keys=[self.prefix + key], args=[limit, window, time.time()]
+        )
+        return bool(allowed), float(retry_after)
+
+
+class RateLimitMiddleware:
+    """
+    Token bucket rate limiting for the paths in target_paths.
+
+    Written as plain ASGI so other routes pay nothing. Authenticated
+    requests are limited per user, everything else per client IP. The IP
+    is read from X-Forwarded-For, counting trusted_proxies entries from
+    the right (each proxy appends the address it got the request from, so
+    anything further left was sent by the client and can be forged). With
+    0 trusted proxies the header is ignored.
+    """
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
         app,
         limit: int = 5,
         window: int = 60,
-        target_paths: List[str] = None  # List of paths to target for rate limiting
-    
+        target_paths: List[str] = None,  # List of paths to target for rate limiting
+        backend=None,
+        secret: str = None,  # JWT secret, to key on the user when logged in
+        trusted_proxies: int = 1,
     ):
-        super().__init__(app)
+        self.app = app
         self.limit = limit
         self.window = window
-        # Store the list of paths
-        self.target_paths = target_paths
-        self.requests = defaultdict(list)
+        self.target_paths = frozenset(target_paths or [])
+        self.backend = backend or MemoryRateLimitBackend()
+        self.secret = secret
+        self.trusted_proxies = trusted_proxies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.target_paths:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = await self.backend.hit(
+            self._client_key(scope), self.limit, self.window
+        )
+        if not allowed:
+            response = Response(
+                content="Too many requests. Please try again later.",
+                status_code=429,
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next):
-        # Check if the current request path is in the list of target paths
-        if request.url.path in self.target_paths:
-            client_ip = request.headers.get("X-Forwarded-For", request.client.host)
-            now = time.time()
+    def _client_key(self, scope) -> str:
+        headers = dict(scope["headers"])
 
-            valid_requests = [t for t in self.requests[client_ip] if now - t < self.window]
-            self.requests[client_ip] = valid_requests
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if self.secret and authorization.lower().startswith("bearer "):
+            try:
+                # Only trust the user id if the token is really ours,
+                # otherwise anyone could drain someone else's bucket
+                payload = decode_jwt(authorization[7:], self.secret, ["fastapi-users:auth"])
+                return f"user:{payload['sub']}"
+            except (jwt.PyJWTError, KeyError):
+                pass
 
-            if len(self.requests[client_ip]) >= self.limit:
-                return Response(
-                    content="Too many requests. Please try again later.",
-                    status_code=429
-                )
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded and self.trusted_proxies:
+            entries = [entry.strip() for entry in forwarded.decode("latin-1").split(",")]
+            return "ip:" + entries[max(0, len(entries) - self.trusted_proxies)]
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
 
-            self.requests[client_ip].append(now)
 
-        response = await call_next(request)
-        return response
+def get_rate_limit_backend(settings):
+    """Create the rate limit backend configured in settings"""
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(settings.RATE_LIMIT_URL)
+    return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
@@ -0,0 +1,88 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Query stats of the request being handled, None outside requests
+_request_stats: ContextVar = ContextVar("sql_request_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+def _param_shape(parameters):
+    """Types of the bound parameters, never their values"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: shape of the first row and how many rows
+            return {"rows": len(parameters), "row": _param_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def install_query_instrumentation(engine, slow_query_ms: float = 200):
+    """Count queries per request and log slow ones, on an (async) engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+        if elapsed * 1000 >= slow_query_ms:
+            logger.warning(
+                "Slow query (%.1f ms): %s params=%s",
+                elapsed * 1000, " ".join(statement.split()), _param_shape(parameters),
+            )
+
+
+class SQLTimingMiddleware:
+    """
+    Adds a Server-Timing header with the number of queries and the time
+    spent in the database for each request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - started) * 1000
+                value = (
+                    f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}, '
+                    f"app;dur={total:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", value.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
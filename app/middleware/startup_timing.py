@@ -0,0 +1,40 @@
+# Cold start measurement, turned on with STARTUP_TIMING=true.
+#
+# Each worker prints how long importing the app took and, once, how long
+# its first request took and how long after the import started it was
+# answered. The first request pays for everything still lazy (pool
+# connections, course catalog, search index), so that is the number that
+# shows up as latency right after a deploy or a scale-up.
+import os
+import time
+
+
+class StartupTimingMiddleware:
+    """Prints the latency of the first request served by this worker"""
+
+    def __init__(self, app, import_started: float):
+        self.app = app
+        self.import_started = import_started
+        self.reported = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.reported:
+            await self.app(scope, receive, send)
+            return
+
+        self.reported = True
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished = time.perf_counter()
+            print(
+                f"[startup] pid {os.getpid()}: first request {scope['method']} {scope['path']} "
+                f"took {(finished - started) * 1000:.1f} ms, "
+                f"{finished - self.import_started:.2f}s after import started"
+            )
+
+
+def report_import_time(import_started: float):
+    print(f"[startup] pid {os.getpid()}: importing app.main took "
+          f"{(time.perf_counter() - import_started) * 1000:.1f} ms")
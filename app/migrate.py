@@ -0,0 +1,39 @@
+"""
+Bring the database schema up to date. Run from release.sh:
+
+    python -m app.migrate
+
+Databases created by the old create_all startup have the tables but no
+alembic_version, those are stamped at the initial revision first so the
+later migrations apply on top.
+"""
+import asyncio
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.database import engine
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+BASELINE_REVISION = "0001"
+
+
+async def _needs_baseline_stamp() -> bool:
+    async with engine.connect() as conn:
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+    await engine.dispose()
+    return "books" in tables and "alembic_version" not in tables
+
+
+def migrate():
+    config = Config(ALEMBIC_INI)
+    if asyncio.run(_needs_baseline_stamp()):
+        print("Existing schema without migration history, stamping baseline")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+
+if __name__ == "__main__":
+    migrate()
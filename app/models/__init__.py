@@ -4,5 +4,6 @@
 from app.userDB import User  # First, the User model
 from app.models.book import BookDBModel  # Then dependent models
 from app.models.course import CourseDBModel  # Other models
+from app.models.saved_search import SavedSearchDBModel
 
 # to help with circular imports n shit type shit
\ No newline at end of file
@@ -1,12 +1,27 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum, DateTime, Index, DDL, JSON, event
 from sqlalchemy.orm import relationship
-from sqlalchemy.types import UUID
+from fastapi_users_db_sqlalchemy.generics import GUID
 from app.database import Base
 from datetime import datetime
 import uuid
 
 class BookDBModel(Base):
     __tablename__ = "books"
+    # Keep in sync with the migrations in alembic/versions. The search
+    # column and trigram indexes only exist on Postgres and live in the
+    # migrations alone.
+    __table_args__ = (
+        # Composite indexes matching the sort keys used for keyset pagination,
+        # on their own and behind each equality filter of GET /books/
+        Index("ix_books_created_at_id", "created_at", "id"),
+        Index("ix_books_price_created_at_id", "price", "created_at", "id"),
+        Index("ix_books_course_code_created_at_id", "course_code", "created_at", "id"),
+        Index("ix_books_course_code_price_created_at_id", "course_code", "price", "created_at", "id"),
+        Index("ix_books_condition_created_at_id", "condition", "created_at", "id"),
+        Index("ix_books_condition_price_created_at_id", "condition", "price", "created_at", "id"),
+        # /my-books/
+        Index("ix_books_user_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -16,8 +31,17 @@ class BookDBModel(Base):
     condition = Column(String, nullable=False)
     course_code = Column(String, ForeignKey("courses.code"))
     image_url = Column(String, nullable=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # "pending" while the image is uploading, then "ready" or "failed"
+    image_status = Column(String, nullable=False, default="ready", server_default="ready")
+    # Resized copies for srcset, [{"width", "format", "url"}, ...]
+    image_variants = Column(JSON(none_as_null=True), nullable=True)
+    # Same type as users.id so joins match on every database
+    # (native uuid on Postgres, CHAR(36) elsewhere)
+    user_id = Column(GUID, ForeignKey("users.id"))
+    # Part of every listing sort key and cursor, so never NULL
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Set on every UPDATE that goes through SQLAlchemy, used for ETags
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     owner = relationship("User", back_populates="books")
     
@@ -29,3 +53,61 @@ class BookDBModel(Base):
     
     def __repr__(self):
         return f"<Book {self.title}>"
+
+
+# Every insert, update and delete on books bumps courses.version for the
+# courses it touches, so GET /books/course/{code} can be validated with a
+# primary key lookup. Same triggers as migration 0005, for databases made
+# with create_all.
+POSTGRES_COURSE_VERSION_DDL = (
+    """CREATE OR REPLACE FUNCTION bump_course_version() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE courses SET version = version + 1, updated_at = timezone('utc', now())
+            WHERE code IN (SELECT course_code FROM new_rows);
+        ELSIF TG_OP = 'UPDATE' THEN
+            UPDATE courses SET version = version + 1, updated_at = timezone('utc', now())
+            WHERE code IN (SELECT course_code FROM new_rows UNION SELECT course_code FROM old_rows);
+        ELSE
+            UPDATE courses SET version = version + 1, updated_at = timezone('utc', now())
+            WHERE code IN (SELECT course_code FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    # Statement level, so a bulk insert bumps each course once
+    """CREATE TRIGGER books_course_version_insert AFTER INSERT ON books
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_course_version()""",
+    """CREATE TRIGGER books_course_version_update AFTER UPDATE ON books
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_course_version()""",
+    """CREATE TRIGGER books_course_version_delete AFTER DELETE ON books
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_course_version()""",
+)
+
+SQLITE_COURSE_VERSION_DDL = (
+    """CREATE TRIGGER books_course_version_insert AFTER INSERT ON books BEGIN
+        UPDATE courses SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE code = NEW.course_code;
+    END""",
+    """CREATE TRIGGER books_course_version_update AFTER UPDATE ON books BEGIN
+        UPDATE courses SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE code IN (OLD.course_code, NEW.course_code);
+    END""",
+    """CREATE TRIGGER books_course_version_delete AFTER DELETE ON books BEGIN
+        UPDATE courses SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE code = OLD.course_code;
+    END""",
+)
+
+for dialect, statements in (
+    ("postgresql", POSTGRES_COURSE_VERSION_DDL),
+    ("sqlite", SQLITE_COURSE_VERSION_DDL),
+):
+    for statement in statements:
+        event.listen(
+            BookDBModel.__table__, "after_create",
+            DDL(statement).execute_if(dialect=dialect),
+        )
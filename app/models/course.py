@@ -1,13 +1,16 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, String, Integer, DateTime
 from app.database import Base
 
 class CourseDBModel(Base):
     __tablename__ = "courses"
 
     code = Column(String, primary_key=True, index=True)
+    # Bumped by a trigger on books whenever a book in this course is
+    # added, changed or removed (see app/models/book.py)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, nullable=True)
     
     def __repr__(self):
         return f"<Course {self.code}>"
 
 
-    
\ No newline at end of file
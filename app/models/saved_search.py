@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from fastapi_users_db_sqlalchemy.generics import GUID
+from app.database import Base
+from datetime import datetime
+
+
+class SavedSearchDBModel(Base):
+    """Filters a user wants to be alerted about when a new book matches"""
+    __tablename__ = "saved_searches"
+    # Keep in sync with the migrations in alembic/versions
+    __table_args__ = (
+        Index("ix_saved_searches_user_id", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(GUID, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Every filter is optional, a missing one matches anything
+    course_code = Column(String, ForeignKey("courses.code"), nullable=True)
+    price_max = Column(Integer, nullable=True)
+    condition = Column(String, nullable=True)
+    # Words that must all appear in the title
+    title_words = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SavedSearch {self.id} of {self.user_id}>"
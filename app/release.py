@@ -0,0 +1,54 @@
+"""
+One-off setup for a deploy: migrate the schema and seed the course codes.
+Run from release.sh (Heroku release phase) before any worker starts:
+
+    python -m app.release
+
+Workers don't touch the schema at boot anymore. When several releases can
+run at once (e.g. one per container) a Postgres advisory lock makes them
+take turns, the later ones find nothing left to do.
+"""
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.data.coursedata import seed_data
+from app.database import engine
+from app.migrate import migrate
+
+# Any constant works, it only has to be the same for every release
+RELEASE_LOCK_KEY = 0x63626F6F6B73  # "cbooks"
+
+
+async def release():
+    started = time.perf_counter()
+    # Own connection outside the app pool, held until the release is done
+    lock_engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+    try:
+        async with lock_engine.connect() as conn:
+            locked = conn.dialect.name == "postgresql"
+            if locked:
+                print("Waiting for the release lock...")
+                await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": RELEASE_LOCK_KEY})
+                # Session level lock, don't sit idle in a transaction
+                await conn.commit()
+            try:
+                # Alembic runs its own event loop, so it gets a thread
+                await asyncio.to_thread(migrate)
+                await seed_data()
+            finally:
+                if locked:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RELEASE_LOCK_KEY})
+                    await conn.commit()
+    finally:
+        await engine.dispose()
+        await lock_engine.dispose()
+    print(f"Release finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(release())
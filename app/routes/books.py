@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.crud.book import *
+from app.crud.course import CRUDget_course_version
+from app.events import OVERFLOW, get_event_broker
 import app.database as database
-from app.schemas.book import BookCreate, BookAPIModel
-from typing import Optional, List
+from app.schemas.book import BookCreate, BookUpdate, BookAPIModel, BookWithSellerAPIModel, BookFacets, BookImportReport
+from app.crud.bookImport import CRUDimport_books, parse_manifest
+from app.schemas.serialization import book_list_response, encode_books_csv, encode_books_ndjson
+from app.core.config import settings
+from app.core.http_cache import (
+    BOOK_CACHE_CONTROL,
+    COURSE_BOOKS_CACHE_CONTROL,
+    cache_headers,
+    is_not_modified,
+    not_modified_response,
+)
+from typing import Optional, List, Literal
 from app.userDB import User
-from app.crud.users import current_active_user
+from app.crud.users import current_active_user, current_optional_user, current_superuser
 import uuid
 from fastapi_users import schemas
 from pydantic import BaseModel
@@ -40,48 +53,270 @@ async def create_book(
     created_book = await CRUDcreate_book(db, book, image, current_user.id)
     return created_book
 
+@router.post("/books/import", response_model=BookImportReport)
+async def import_books(
+    manifest: UploadFile = File(...),
+    images: Optional[UploadFile] = File(None),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: User = Depends(current_active_user)
+):
+    """
+    Create many books at once from a CSV or NDJSON manifest (.csv, .ndjson
+    or .jsonl) with the columns title, author, price, description,
+    condition, course_code and optionally image, the name of a file in the
+    `images` zip archive.
+
+    Valid rows are created and invalid ones reported, row by row. Images
+    upload in the background like for POST /books/.
+    """
+    rows = await parse_manifest(manifest)
+    return await CRUDimport_books(db, rows, images.file if images else None, current_user.id)
+
 @router.get("/books/", response_model=List[BookAPIModel])
 async def get_books(
+    response: Response,
     db: AsyncSession = Depends(database.get_db),
     skip: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1),
     course_code: Optional[str] = None,
     price_min: Optional[int] = None,
     price_max: Optional[int] = None,
     # location parameter removed
     condition: Optional[str] = None,
     title: Optional[str] = None,
+    sort: Literal["newest", "price_asc", "price_desc"] = "newest",
+    cursor: Optional[str] = None,
+    include_total: bool = False,
 ):
     """
     Retrieve books with optional filtering.
+
+    Pass the X-Next-Cursor header from the previous response as `cursor`
+    to get the next page; `skip` is ignored when a cursor is given.
+    X-Has-More tells if there is a next page. With include_total,
+    X-Total-Count holds the number of matches, estimated for big result
+    sets (X-Total-Count-Exact: false).
     """
-    books = await CRUDget_books_with_filters(
+    try:
+        books, next_cursor = await CRUDget_books_with_filters(
+            db,
+            skip=skip,
+            limit=limit,
+            course_code=course_code,
+            price_min=price_min,
+            price_max=price_max,
+            # location parameter removed
+            condition=condition,
+            title=title,
+            sort=sort,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["X-Has-More"] = "true" if next_cursor else "false"
+
+    if include_total:
+        count = await CRUDcount_books(
+            db,
+            course_code=course_code,
+            price_min=price_min,
+            price_max=price_max,
+            condition=condition,
+            title=title,
+        )
+        response.headers["X-Total-Count"] = str(count["total"])
+        response.headers["X-Total-Count-Exact"] = "true" if count["exact"] else "false"
+
+    if settings.FAST_BOOK_LISTS:
+        return book_list_response(books, headers=dict(response.headers))
+    return books
+
+@router.get("/books/facets", response_model=BookFacets)
+async def get_book_facets(
+    db: AsyncSession = Depends(database.get_db),
+    course_code: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    title: Optional[str] = None,
+):
+    """
+    Counts of the books matching the same filters as GET /books/, per
+    course code, condition and price range.
+    """
+    return await CRUDget_book_facets(
         db,
-        skip=skip,
-        limit=limit,
         course_code=course_code,
         price_min=price_min,
         price_max=price_max,
-        # location parameter removed
         condition=condition,
-        title=title 
+        title=title,
     )
-    return books
+
+@router.get("/books/export")
+async def export_books(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    course_code: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    title: Optional[str] = None,
+    current_user: User = Depends(current_superuser)
+):
+    """
+    Stream every book matching the GET /books/ filters as NDJSON or CSV,
+    in id order. Admins only.
+    """
+    async def body():
+        first = True
+        async for rows in CRUDstream_books(course_code, price_min, price_max, condition, title):
+            if format == "csv":
+                yield encode_books_csv(rows, header=first)
+            else:
+                yield encode_books_ndjson(rows)
+            first = False
+        if first and format == "csv":
+            # No matches, still send the header
+            yield encode_books_csv([], header=True)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="books.{format}"'},
+    )
+
+@router.get("/books/stream")
+async def stream_books(course_code: Optional[str] = None):
+    """
+    Server-Sent Events feed of new and removed listings, for one course or
+    all of them. Instead of polling GET /books/course/{course_code}, fetch
+    it once and keep this open.
+
+    Events are "created" and "updated" (both with the whole book) and
+    "deleted". "updated" is sent when a book is edited and again when its
+    image has finished uploading; a book that moves to another course is
+    "deleted" from the old one first. A client that falls too far behind
+    is disconnected and should reconnect and refetch.
+    """
+    subscription = get_event_broker().subscribe(course_code)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many open streams, try again later")
+
+    async def body():
+        try:
+            # Reconnect after 3s if the connection drops
+            yield b"retry: 3000\n\n"
+            while True:
+                message = await subscription.get(timeout=settings.STREAM_HEARTBEAT)
+                if message is OVERFLOW:
+                    break
+                if message is None:
+                    # Comment line, keeps proxies from closing an idle stream
+                    message = b": keep-alive\n\n"
+                yield message
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/books/search", response_model=List[BookAPIModel])
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    course_code: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db),
+):
+    """
+    Search titles, authors and descriptions, best match first.
+    Handles partial words and small typos.
+    """
+    return await CRUDsearch_books(db, q, limit=limit, offset=offset, course_code=course_code)
+
+# Max ids per batch request
+MAX_BATCH_IDS = 100
+
+@router.get("/books/batch", response_model=List[BookWithSellerAPIModel])
+async def get_books_batch(
+    ids: str = Query(..., description="Comma separated book ids, e.g. 1,2,3"),
+    include_seller: bool = False,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: Optional[User] = Depends(current_optional_user),
+):
+    """
+    Get several books in one request, in the order asked for.
+    Ids that don't exist are left out. Seller contact info is only
+    included for logged in users asking for it.
+    """
+    try:
+        book_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    if not book_ids:
+        raise HTTPException(status_code=400, detail="No book ids given")
+    if len(book_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+
+    with_seller = include_seller and current_user is not None
+    return await CRUDget_books_by_ids(db, book_ids, with_seller=with_seller)
 
 @router.get("/books/course/{course_code}", response_model=List[BookAPIModel])
-async def get_books_by_course(course_code: str, db: AsyncSession = Depends(database.get_db)):
+async def get_books_by_course(
+    course_code: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(database.get_db)
+):
     """Get books by course code"""
-    books = await CRUDget_books_by_course(db, course_code)
+    # The course version is a primary key lookup, so a revalidation that
+    # matches never loads the books
+    course = await CRUDget_course_version(db, course_code)
+    version = course.version if course else None
+    if course:
+        headers = cache_headers(
+            f'W/"course-{course_code}-{course.version}"',
+            course.updated_at,
+            COURSE_BOOKS_CACHE_CONTROL,
+        )
+        if is_not_modified(request, headers["ETag"], course.updated_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
+
+    books = await CRUDget_books_by_course(db, course_code, version)
     if not books:
         raise HTTPException(status_code=404, detail="No books found")
+    if settings.FAST_BOOK_LISTS:
+        return book_list_response(books, headers=dict(response.headers))
     return books
 
 @router.get("/books/id/{book_id}", response_model=BookAPIModel)
-async def get_book_details(book_id: int, db: AsyncSession = Depends(database.get_db)):
+async def get_book_details(
+    book_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(database.get_db)
+):
     """Get book details by ID"""
     book = await CRUDget_book(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
+
+    modified = book["updated_at"] or book["created_at"]
+    headers = cache_headers(
+        f'W/"book-{book_id}-{modified:%Y%m%d%H%M%S%f}"',
+        modified,
+        BOOK_CACHE_CONTROL,
+    )
+    if is_not_modified(request, headers["ETag"], modified):
+        return not_modified_response(headers)
+    response.headers.update(headers)
     return book
 
 @router.get("/my-books/", response_model=List[BookAPIModel])
@@ -91,6 +326,8 @@ async def get_my_books(
 ):
     """Get books owned by the current user"""
     books = await CRUDget_books_by_user(db, current_user.id)
+    if settings.FAST_BOOK_LISTS:
+        return book_list_response(books)
     return books
 
 @router.delete("/books/{book_id}")
@@ -100,36 +337,30 @@ async def delete_book(
     current_user: User = Depends(current_active_user)
 ):
     """Delete a book if the current user is the owner"""
-    book = await CRUDget_book(db, book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    
-    # Check if the current user is the owner
-    if book.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this book")
-    
-    success = await CRUDdelete_book(db, book_id)
-    if success:
+    # Ownership is part of the DELETE, telling 404 from 403 apart only
+    # costs a query when nothing was deleted
+    if await CRUDdelete_book(db, book_id, current_user.id):
         return {"message": "Book successfully deleted"}
-    raise HTTPException(status_code=500, detail="Failed to delete book")
+    if not await CRUDbook_exists(db, book_id):
+        raise HTTPException(status_code=404, detail="Book not found")
+    raise HTTPException(status_code=403, detail="Not authorized to delete this book")
 
 @router.put("/books/{book_id}", response_model=BookAPIModel)
 async def update_book(
     book_id: int,
-    update_data: dict,
+    update_data: BookUpdate,
     db: AsyncSession = Depends(database.get_db),
     current_user: User = Depends(current_active_user)
 ):
     """Update a book if the current user is the owner"""
-    book = await CRUDget_book(db, book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    
-    # Check if the current user is the owner
-    if book.user_id != current_user.id:
+    updated_book = await CRUDupdate_book(db, book_id, update_data, current_user.id)
+    if updated_book is None:
+        if not await CRUDbook_exists(db, book_id):
+            raise HTTPException(status_code=404, detail="Book not found")
         raise HTTPException(status_code=403, detail="Not authorized to update this book")
-    
-    updated_book = await CRUDupdate_book(db, book_id, update_data)
+    # Checked after ownership, so only the owner learns the body was empty
+    if not update_data.model_dump(exclude_unset=True, exclude_none=True):
+        raise HTTPException(status_code=400, detail="Nothing to update")
     return updated_book
 
 # Define a proper response model for seller info that includes phone_number
@@ -144,21 +375,17 @@ async def get_seller_info(
     current_user: User = Depends(current_active_user)
 ):
     """Get contact information for the seller of a specific book"""
-    # First get the book
-    book = await CRUDget_book(db, book_id)
-    if not book:
+    # Book and owner in one query
+    seller = await CRUDget_seller_info(db, book_id)
+    if not seller:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    stmt = select(User).where(User.id == book.user_id)
-    result = await db.execute(stmt)
-    owner = result.scalar_one_or_none()
-    
-    if not owner:
+    if seller["email"] is None:
         raise HTTPException(status_code=404, detail="Book owner not found")
     
     # Return email and phone_number (if available)
     return {
-        "email": owner.email,
-        "phone_number": owner.phone_number
+        "email": seller["email"],
+        "phone_number": seller["phone_number"]
     }
 
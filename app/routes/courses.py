@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 import app.database as database
 from app.schemas.course import CourseCreate, CourseAPIModel
-from app.crud.course import CRUDcreate_course, CRUDget_courses, CRUDget_course
+from app.crud.course import CRUDcreate_course, CRUDget_courses, CRUDget_course, CRUDget_course_catalog
+from app.core.http_cache import (
+    COURSE_CODES_CACHE_CONTROL, accepts_encoding, cache_headers, is_not_modified, not_modified_response,
+)
 from typing import List
 
 router = APIRouter()
@@ -10,17 +13,28 @@ router = APIRouter()
 
 @router.get("/course_codes/", response_model=List[CourseAPIModel])
 async def get_course_codes(
+    request: Request,
     db: AsyncSession = Depends(database.get_db)
 ):
-    # Fix: Use await with the async function
-    return await CRUDget_courses(db)
+    # Served from the pre-encoded in-memory catalog
+    catalog = await CRUDget_course_catalog(db)
+    headers = cache_headers(catalog.etag, None, COURSE_CODES_CACHE_CONTROL)
+    headers["Vary"] = "Accept-Encoding"
+
+    if is_not_modified(request, catalog.etag):
+        return not_modified_response(headers)
+
+    if accepts_encoding(request, "gzip"):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=catalog.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
 
 @router.get("/course_codes/{course_code}", response_model=CourseAPIModel)
 async def get_course(
     course_code: str, 
     db: AsyncSession = Depends(database.get_db)
 ):
-    course = await CRUDget_course(db, course_code)
-    if not course:
+    catalog = await CRUDget_course_catalog(db)
+    if course_code not in catalog.codes:
         raise HTTPException(status_code=404, detail="Course not found")
-    return course
\ No newline at end of file
+    return {"code": course_code}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from app.database import get_pool_stats
+from app.crud.users import current_superuser
+from app.userDB import User
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+
+@router.get("/pool-stats")
+async def pool_stats(current_user: User = Depends(current_superuser)):
+    """Connection pool usage for the worker that answers the request"""
+    return get_pool_stats()
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+import app.database as database
+from app.crud.saved_search import CRUDcreate_saved_search, CRUDget_saved_searches, CRUDdelete_saved_search
+from app.crud.users import current_active_user
+from app.schemas.saved_search import SavedSearchCreate, SavedSearchAPIModel
+from app.userDB import User
+from typing import List
+
+router = APIRouter()
+
+
+@router.post("/saved-searches/", response_model=SavedSearchAPIModel)
+async def create_saved_search(
+    search: SavedSearchCreate,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: User = Depends(current_active_user)
+):
+    """Get alerted when a new book matches these filters"""
+    return await CRUDcreate_saved_search(db, search, current_user.id)
+
+@router.get("/saved-searches/", response_model=List[SavedSearchAPIModel])
+async def get_saved_searches(
+    db: AsyncSession = Depends(database.get_db),
+    current_user: User = Depends(current_active_user)
+):
+    """Saved searches of the current user"""
+    return await CRUDget_saved_searches(db, current_user.id)
+
+@router.delete("/saved-searches/{search_id}")
+async def delete_saved_search(
+    search_id: int,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: User = Depends(current_active_user)
+):
+    """Delete one of the current user's saved searches"""
+    if not await CRUDdelete_saved_search(db, search_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return {"message": "Saved search deleted"}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, HttpUrl, Field
 import uuid
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class BookBase(BaseModel):
@@ -14,11 +14,59 @@ class BookBase(BaseModel):
 class BookCreate(BookBase):
     pass
 
+class BookUpdate(BaseModel):
+    """Fields a seller may change on a book, all optional"""
+    title: Optional[str] = None
+    author: Optional[str] = None
+    price: Optional[int] = None
+    description: Optional[str] = None
+    course_code: Optional[str] = None
+    condition: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
+
+class ImageVariant(BaseModel):
+    """A resized copy of a book's image, for srcset"""
+    width: int
+    format: str  # "webp" or "jpeg"
+    url: str
+
 class BookAPIModel(BookBase):
     id: int
     user_id: uuid.UUID  # Changed from str to uuid.UUID
     image_url: Optional[str] = None
+    image_status: str = "ready"
+    image_variants: Optional[List[ImageVariant]] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BookWithSellerAPIModel(BookAPIModel):
+    """Book with the seller's contact info, only filled in for logged in users"""
+    seller_email: Optional[str] = None
+    seller_phone_number: Optional[str] = None
+
+
+class BookFacets(BaseModel):
+    """Number of matching books per facet value"""
+    total: int
+    course_code: Dict[str, int]
+    condition: Dict[str, int]
+    price: Dict[str, int]
+
+
+class BookImportRow(BaseModel):
+    """Result for one manifest row, row numbers start at 1"""
+    row: int
+    status: str  # "created" or "error"
+    book_id: Optional[int] = None
+    errors: List[str] = []
+
+
+class BookImportReport(BaseModel):
+    created: int
+    failed: int
+    rows: List[BookImportRow]
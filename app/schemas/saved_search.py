@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional
+from datetime import datetime
+
+class SavedSearchBase(BaseModel):
+    course_code: Optional[str] = None
+    price_max: Optional[int] = Field(None, ge=0)
+    condition: Optional[str] = None
+    # Space separated, every word has to be in the title
+    title_words: Optional[str] = None
+
+class SavedSearchCreate(SavedSearchBase):
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if not any((self.course_code, self.price_max is not None, self.condition, self.title_words)):
+            raise ValueError("A saved search needs at least one filter")
+        return self
+
+class SavedSearchAPIModel(SavedSearchBase):
+    id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,19 @@
+# Book search engines. Postgres uses a generated tsvector column and
+# pg_trgm indexes, everything else (SQLite in tests/dev) falls back to
+# an in-process index.
+from app.database import engine
+from app.search.memory import InMemorySearchEngine
+from app.search.postgres import PostgresSearchEngine
+
+_search_engine = None
+
+
+def get_search_engine():
+    """Return the search engine matching the configured database"""
+    global _search_engine
+    if _search_engine is None:
+        if engine.dialect.name == "postgresql":
+            _search_engine = PostgresSearchEngine()
+        else:
+            _search_engine = InMemorySearchEngine()
+    return _search_engine
@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import math
+from collections import defaultdict
+from collections.abc import Mapping
+from sqlalchemy import select
+from app.models.book import BookDBModel
+from app.search.tokens import tokenize, trigrams
+
+# Field weights, same order of importance as the Postgres setweight A/B/C
+FIELD_WEIGHTS = {"title": 1.0, "author": 0.6, "description": 0.3}
+
+# How much a match counts depending on how the query word matched
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.5
+
+# Minimum trigram similarity for a misspelled word to count as a match
+FUZZY_THRESHOLD = 0.4
+
+
+def _field(book, name):
+    if isinstance(book, Mapping):
+        return book.get(name)
+    return getattr(book, name, None)
+
+
+class InMemorySearchEngine:
+    """
+    In-process inverted index used when the database is not Postgres.
+
+    The index is built from the books table on first use and kept up to date
+    by the book CRUD functions. It is per process, so with several workers a
+    listing made on another worker only shows up after a restart - fine for
+    SQLite dev setups and tests, use Postgres for production.
+    """
+
+    def __init__(self):
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        # term -> {book_id: field weight}
+        self._postings = defaultdict(dict)
+        # book_id -> terms, used to remove a book from the postings
+        self._doc_terms = {}
+        self._course_codes = {}
+        # sorted vocabulary for prefix lookups
+        self._vocabulary = []
+        # trigram -> terms, for misspellings
+        self._trigrams = defaultdict(set)
+
+    async def _load(self, db):
+        async with self._lock:
+            if self._loaded:
+                return
+            stmt = select(
+                BookDBModel.id,
+                BookDBModel.title,
+                BookDBModel.author,
+                BookDBModel.description,
+                BookDBModel.course_code,
+            )
+            result = await db.execute(stmt)
+            for row in result.mappings():
+                self._add(row)
+            self._loaded = True
+
+    def _add(self, book):
+        book_id = _field(book, "id")
+        self._remove(book_id)
+
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(_field(book, field)):
+                if weights.get(term, 0) < weight:
+                    weights[term] = weight
+
+        for term, weight in weights.items():
+            if term not in self._postings:
+                bisect.insort(self._vocabulary, term)
+                for gram in trigrams(term):
+                    self._trigrams[gram].add(term)
+            self._postings[term][book_id] = weight
+        self._doc_terms[book_id] = set(weights)
+        self._course_codes[book_id] = _field(book, "course_code")
+
+    def _remove(self, book_id):
+        terms = self._doc_terms.pop(book_id, None)
+        self._course_codes.pop(book_id, None)
+        if not terms:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                    del self._vocabulary[index]
+                for gram in trigrams(term):
+                    self._trigrams[gram].discard(term)
+                    if not self._trigrams[gram]:
+                        del self._trigrams[gram]
+
+    async def index_book(self, book):
+        """Add or replace a book in the index"""
+        if self._loaded:
+            self._add(book)
+
+    async def remove_book(self, book_id: int):
+        """Drop a book from the index"""
+        if self._loaded:
+            self._remove(book_id)
+
+    def _expand(self, token):
+        """Vocabulary terms matching a query token, with a match quality"""
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            matches.setdefault(term, PREFIX_MATCH)
+
+        if not matches and len(token) > 2:
+            query_grams = trigrams(token)
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for term in self._trigrams.get(gram, ()):
+                    shared[term] += 1
+            for term, count in shared.items():
+                similarity = count / (len(query_grams) + len(trigrams(term)) - count)
+                if similarity >= FUZZY_THRESHOLD:
+                    matches[term] = FUZZY_MATCH * similarity
+        return matches
+
+    def rank(self, query: str, course_code=None) -> list:
+        """Book ids matching every word of the query, best match first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        total_docs = max(len(self._doc_terms), 1)
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for term, quality in self._expand(token).items():
+                postings = self._postings[term]
+                idf = math.log(1 + total_docs / len(postings))
+                for book_id, weight in postings.items():
+                    score = quality * weight * idf
+                    if token_scores.get(book_id, 0) < score:
+                        token_scores[book_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    book_id: score + token_scores[book_id]
+                    for book_id, score in scores.items()
+                    if book_id in token_scores
+                }
+            if not scores:
+                return []
+
+        if course_code:
+            scores = {
+                book_id: score for book_id, score in scores.items()
+                if self._course_codes.get(book_id) == course_code
+            }
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+    async def search(self, db, query: str, columns, limit: int = 20, offset: int = 0, course_code=None):
+        """Return books matching query ordered by relevance"""
+        if not self._loaded:
+            await self._load(db)
+
+        ranked = self.rank(query, course_code)[offset:offset + limit]
+        if not ranked:
+            return []
+
+        stmt = select(*columns).where(BookDBModel.id.in_([book_id for book_id, _ in ranked]))
+        result = await db.execute(stmt)
+        rows = {row["id"]: row for row in result.mappings().all()}
+        return [
+            {**rows[book_id], "rank": score}
+            for book_id, score in ranked
+            if book_id in rows
+        ]
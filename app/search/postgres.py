@@ -0,0 +1,57 @@
+from sqlalchemy import select, func, literal_column, or_
+from app.models.book import BookDBModel
+from app.search.tokens import tokenize
+
+
+class PostgresSearchEngine:
+    """
+    Full-text + trigram search served by GIN indexes.
+
+    Relies on the books.search_vector generated column and the pg_trgm
+    indexes created by migration 0004_book_search.
+    """
+
+    async def index_book(self, book):
+        # search_vector is a generated column, nothing to do
+        pass
+
+    async def remove_book(self, book_id: int):
+        pass
+
+    async def search(self, db, query: str, columns, limit: int = 20, offset: int = 0, course_code=None):
+        """Return books matching query ordered by relevance"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # Every word has to match, each one as a prefix of a word so
+        # shortened words work (e.g. "lin alg" -> "linear algebra"), same
+        # as the memory engine
+        tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in tokens))
+        search_vector = literal_column("books.search_vector")
+        # Must match the indexed expression exactly, so the separator is
+        # inlined rather than sent as a bind parameter
+        haystack = (BookDBModel.title + literal_column("' '") + BookDBModel.author).self_group()
+        phrase = " ".join(tokens)
+
+        rank = (
+            func.ts_rank_cd(search_vector, tsquery)
+            + func.word_similarity(phrase, haystack)
+        ).label("rank")
+
+        stmt = (
+            select(*columns, rank)
+            .where(or_(
+                search_vector.op("@@")(tsquery),
+                # Misspellings: trigram word similarity against title + author
+                haystack.op("%>")(phrase),
+            ))
+            .order_by(rank.desc(), BookDBModel.id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        if course_code:
+            stmt = stmt.where(BookDBModel.course_code == course_code)
+
+        result = await db.execute(stmt)
+        return result.mappings().all()
@@ -0,0 +1,16 @@
+import re
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    """Split text into lowercase word tokens"""
+    if not text:
+        return []
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(word: str) -> set:
+    """Trigrams of a word padded the same way pg_trgm does it"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
@@ -0,0 +1,13 @@
+# Image storage backends. All of them take a file on local disk and
+# return the public URL of the stored copy.
+from app.core.config import settings
+from app.storage.backends import CloudinaryStorage, LocalStorage, MemoryStorage, EXTENSIONS
+
+
+def get_storage():
+    """Create the storage backend configured in settings"""
+    if settings.IMAGE_STORAGE == "local":
+        return LocalStorage(settings.IMAGE_LOCAL_DIR, settings.IMAGE_LOCAL_URL)
+    if settings.IMAGE_STORAGE == "memory":
+        return MemoryStorage()
+    return CloudinaryStorage()
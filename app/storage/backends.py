@@ -0,0 +1,78 @@
+import os
+import shutil
+import time
+import uuid
+import cloudinary.uploader
+
+# Extension used for stored files, by sniffed content type
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+}
+
+# Smallest chunk Cloudinary accepts for chunked uploads
+CLOUDINARY_CHUNK_SIZE = 6 * 1024 * 1024
+
+
+class CloudinaryStorage:
+    """Stores images on Cloudinary. Blocking, call it from a thread."""
+
+    def save(self, path: str, content_type: str, transform: bool = True) -> str:
+        # Responsive variants are already sized, only the original gets the
+        # 300x500 crop
+        transformation = [
+            {"width": 300, "height": 500, "crop": "fill", "gravity": "auto"}
+        ] if transform else None
+        # upload_large sends the file in chunks instead of reading it whole
+        result = cloudinary.uploader.upload_large(
+            path,
+            chunk_size=CLOUDINARY_CHUNK_SIZE,
+            folder="marketplace_images",
+            transformation=transformation,
+        )
+        url = result.get("secure_url")
+        if not url:
+            raise RuntimeError("Cloudinary upload failed")
+        return url
+
+
+class LocalStorage:
+    """Stores images in a directory served by the app under base_url"""
+
+    def __init__(self, root: str, base_url: str, chunk_size: int = 64 * 1024):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        os.makedirs(root, exist_ok=True)
+
+    def save(self, path: str, content_type: str, transform: bool = True) -> str:
+        name = f"{uuid.uuid4().hex}.{EXTENSIONS.get(content_type, 'bin')}"
+        with open(path, "rb") as src, open(os.path.join(self.root, name), "wb") as dst:
+            shutil.copyfileobj(src, dst, self.chunk_size)
+        return f"{self.base_url}/{name}"
+
+
+class MemoryStorage:
+    """
+    Keeps images in a dict, for tests. Can be told to be slow or to fail
+    the first few saves to exercise the upload queue.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_times: int = 0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.files = {}
+
+    def save(self, path: str, content_type: str, transform: bool = True) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("Memory storage failure")
+        url = f"memory://{uuid.uuid4().hex}.{EXTENSIONS.get(content_type, 'bin')}"
+        with open(path, "rb") as f:
+            self.files[url] = (content_type, f.read())
+        return url
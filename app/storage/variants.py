@@ -0,0 +1,99 @@
+# Image processing done before an upload is stored.
+#
+# process_image runs in a ProcessPoolExecutor (see ImageUploadQueue), so
+# this module only needs Pillow and the standard library. The upload is
+# decoded once and turned upright from its EXIF orientation, then written
+# out again at full size and at every variant width in WebP and JPEG.
+# Nothing from the upload's metadata (EXIF with GPS position, ICC profile,
+# comments) is written to any of the files.
+import os
+import tempfile
+from typing import List
+
+from PIL import Image, ImageOps
+
+# Content type and Pillow format per variant format
+FORMATS = {
+    "webp": ("image/webp", "WEBP"),
+    "jpeg": ("image/jpeg", "JPEG"),
+}
+
+# The full size copy replaces the upload, keep it close to the source
+ORIGINAL_QUALITY = 90
+
+
+def _save(image, pil_format: str, quality: int) -> str:
+    fd, out = tempfile.mkstemp(prefix="campusbooks-image-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, pil_format, quality=quality, optimize=True)
+    except BaseException:
+        os.remove(out)
+        raise
+    return out
+
+
+def process_image(path: str, widths: List[int], quality: int = 80,
+                  max_pixels: int = 50_000_000) -> dict:
+    """
+    Write a clean copy of the image at path, and resized copies, to temp files.
+
+    The clean copy is upright and has no metadata, it is a PNG when the
+    image has transparency and a JPEG otherwise. Variant widths wider than
+    the image are skipped (no upscaling), if all of them are the image gets
+    one variant at its own width; no widths means no variants. Returns
+    {"original": {"content_type", "path"}, "variants": [{"width", "format",
+    "content_type", "path"}, ...]}; the caller owns the files.
+
+    Raises Image.DecompressionBombError, before decoding anything, if the
+    image declares more than max_pixels pixels.
+    """
+    files = []
+    try:
+        with Image.open(path) as image:
+            # The header is read but nothing is decoded yet. Pillow's own
+            # limit only warns below twice its default, so check here; a
+            # small file can declare a canvas that fills the worker's memory.
+            if image.width * image.height > max_pixels:
+                raise Image.DecompressionBombError(
+                    f"Image is {image.width}x{image.height}, more than {max_pixels} pixels"
+                )
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                alpha = "A" in image.getbands() or "transparency" in image.info
+                image = image.convert("RGBA" if alpha else "RGB")
+
+            if image.mode == "RGBA":
+                original = {"content_type": "image/png", "path": _save(image, "PNG", ORIGINAL_QUALITY)}
+                # JPEG has no alpha, put transparent parts on white
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            else:
+                original = {"content_type": "image/jpeg", "path": _save(image, "JPEG", ORIGINAL_QUALITY)}
+            files.append(original["path"])
+
+            targets = []
+            if widths:
+                targets = sorted({w for w in widths if w <= image.width}) or [image.width]
+
+            variants = []
+            for width in targets:
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize(
+                    (width, height), Image.Resampling.LANCZOS
+                )
+                for name, (content_type, pil_format) in FORMATS.items():
+                    out = _save(resized, pil_format, quality)
+                    files.append(out)
+                    variants.append({
+                        "width": width,
+                        "format": name,
+                        "content_type": content_type,
+                        "path": out,
+                    })
+    except BaseException:
+        for out in files:
+            os.remove(out)
+        raise
+    return {"original": original, "variants": variants}
@@ -0,0 +1,223 @@
+"""
+Load test for every API route, run in-process against a local database.
+
+    python -m benchmarks.load --books 10000 --concurrency 20 --requests 500
+    python -m benchmarks.load --routes list_books,search --compare benchmarks/results/old.json
+
+Uses SQLite (benchmarks/bench.db) unless BENCH_DATABASE_URL points at a
+local Postgres. Images go to in-memory storage so nothing hits Cloudinary.
+Each run writes throughput and p50/p95/p99 latency per route to
+benchmarks/results/<time>-<commit>.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Settings are read at import time, so configure before importing the app
+os.environ["DATABASE_URL"] = os.environ.get(
+    "BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(BENCH_DIR, 'bench.db')}"
+)
+os.environ.setdefault("SECRET", "benchmark-secret")
+os.environ["IMAGE_STORAGE"] = "memory"
+os.environ["RATE_LIMIT"] = str(10 ** 9)
+
+import httpx
+
+from app.main import app
+from app.data.coursedata import FIXED_COURSE_CODES
+from benchmarks.seed import seed_catalogue
+
+# Smallest valid-looking JPEG header, enough for the upload type sniffing
+FAKE_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 2048
+BENCH_PASSWORD = "benchmark-password"
+
+
+class Context:
+    """State shared by the scenarios: auth headers and ids to pick from"""
+
+    def __init__(self, books: int, headers: dict, own_book_ids: list):
+        self.books = books
+        self.headers = headers
+        self.own_book_ids = own_book_ids
+        self.counter = 0
+
+    def book_id(self):
+        return random.randint(1, self.books)
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+
+def _book_form():
+    return {
+        "title": "Benchmark Book", "author": "Bench", "course_code": random.choice(FIXED_COURSE_CODES),
+        "description": "created by the load test", "condition": "good", "price": str(random.randint(20, 900)),
+    }
+
+
+# name -> function(client, ctx) returning a request coroutine
+SCENARIOS = {
+    "list_books": lambda c, ctx: c.get("/books/", params={"limit": 20}),
+    "list_books_deep": lambda c, ctx: c.get("/books/", params={"limit": 20, "skip": ctx.books // 2}),
+    "list_books_filtered": lambda c, ctx: c.get("/books/", params={
+        "course_code": random.choice(FIXED_COURSE_CODES), "price_max": 500, "sort": "price_asc"}),
+    "search": lambda c, ctx: c.get("/books/search", params={"q": random.choice(["algebra", "calc", "mechanix", "databases"])}),
+    "batch": lambda c, ctx: c.get("/books/batch", params={"ids": ",".join(str(ctx.book_id()) for _ in range(20))}),
+    "books_by_course": lambda c, ctx: c.get(f"/books/course/{random.choice(FIXED_COURSE_CODES)}"),
+    "book_details": lambda c, ctx: c.get(f"/books/id/{ctx.book_id()}"),
+    "seller_info": lambda c, ctx: c.get(f"/books/id/{ctx.book_id()}/seller-info", headers=ctx.headers),
+    "my_books": lambda c, ctx: c.get("/my-books/", headers=ctx.headers),
+    "create_book": lambda c, ctx: c.post("/books/", headers=ctx.headers, data=_book_form(),
+                                         files={"image": ("bench.jpg", FAKE_JPEG, "image/jpeg")}),
+    "update_book": lambda c, ctx: c.put(f"/books/{random.choice(ctx.own_book_ids)}", headers=ctx.headers,
+                                        json={"price": random.randint(20, 900)}),
+    "delete_book": lambda c, ctx: c.delete(f"/books/{ctx.own_book_ids.pop()}", headers=ctx.headers),
+    "course_codes": lambda c, ctx: c.get("/course_codes/"),
+    "course_code": lambda c, ctx: c.get(f"/course_codes/{random.choice(FIXED_COURSE_CODES)}"),
+    "auth_register": lambda c, ctx: c.post("/auth/register", json={
+        "email": f"bench{time.time_ns()}-{ctx.next()}@example.com", "password": BENCH_PASSWORD}),
+    "auth_login": lambda c, ctx: c.post("/auth/jwt/login", data={
+        "username": "loadtest@example.com", "password": BENCH_PASSWORD}),
+    "users_me": lambda c, ctx: c.get("/users/me", headers=ctx.headers),
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client, ctx, name, requests, concurrency):
+    scenario = SCENARIOS[name]
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await scenario(client, ctx)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def prepare_user(client, own_books: int):
+    """Log in the load test user and give it books to update and delete"""
+    credentials = {"email": "loadtest@example.com", "password": BENCH_PASSWORD}
+    await client.post("/auth/register", json=credentials)
+    response = await client.post("/auth/jwt/login", data={
+        "username": credentials["email"], "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    own_book_ids = []
+    for _ in range(own_books):
+        response = await client.post("/books/", headers=headers, data=_book_form(),
+                                      files={"image": ("bench.jpg", FAKE_JPEG, "image/jpeg")})
+        response.raise_for_status()
+        own_book_ids.append(response.json()["id"])
+    return headers, own_book_ids
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(results, previous=None):
+    print(f"{'route':<22}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}  statuses")
+    for name, result in results.items():
+        line = (f"{name:<22}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['p99_ms']:>10}  {result['statuses']}")
+        if previous and name in previous:
+            before = previous[name]["p95_ms"]
+            if before:
+                line += f"  p95 {(result['p95_ms'] - before) / before * 100:+.0f}%"
+        print(line)
+
+
+async def main(args):
+    books = await seed_catalogue(args.books, reseed=args.reseed)
+    names = list(SCENARIOS) if args.routes == "all" else args.routes.split(",")
+
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Enough own books for every delete plus the updates
+        own_books = args.requests + args.warmup + 10 if "delete_book" in names else 10
+        headers, own_book_ids = await prepare_user(client, own_books)
+        ctx = Context(books, headers, own_book_ids)
+
+        results = {}
+        for name in names:
+            if args.warmup:
+                await run_scenario(client, ctx, name, args.warmup, args.concurrency)
+            results[name] = await run_scenario(client, ctx, name, args.requests, args.concurrency)
+            print(f"{name}: {results[name]['throughput_rps']} req/s, p95 {results[name]['p95_ms']} ms")
+    await app.router.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "books": books,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{report['timestamp'].replace(':', '')}-{report['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+    print()
+    print_report(results, previous)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=10_000, help="catalogue size")
+    parser.add_argument("--reseed", action="store_true", help="drop and recreate the database first")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per route")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--routes", default="all", help=f"comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results"))
+    parser.add_argument("--compare", help="earlier results file to compare p95 against")
+    asyncio.run(main(parser.parse_args()))
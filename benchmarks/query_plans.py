@@ -0,0 +1,119 @@
+"""
+Checks that every filter/sort combination of GET /books/ is served by an
+index. Seeds a large catalogue, EXPLAINs the exact statements the CRUD layer
+builds and exits non-zero if any of them scans the whole books table.
+
+    python -m benchmarks.query_plans --books 200000
+    BENCH_DATABASE_URL=postgresql+asyncpg://localhost/bench python -m benchmarks.query_plans
+
+Run `python -m app.migrate` against a Postgres database first so the
+trigram indexes exist; title filters are only checked on Postgres since
+SQLite has no index type that can answer ILIKE '%...%'.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ["DATABASE_URL"] = os.environ.get(
+    "BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(BENCH_DIR, 'bench.db')}"
+)
+os.environ.setdefault("SECRET", "benchmark-secret")
+
+from sqlalchemy import select, text
+
+from app.crud.book import BOOK_COLUMNS, SORT_KEYS, _apply_sort, encode_cursor, filtered_books_query
+from app.database import engine
+from benchmarks.seed import seed_catalogue
+
+# Selective values, like a user would pick them
+FILTER_VALUES = {
+    "course_code": "MVE425",
+    "price": (100, 250),
+    "condition": "good",
+    "title": "algebra",
+}
+
+
+def combinations(dialect_name):
+    names = list(FILTER_VALUES)
+    if dialect_name != "postgresql":
+        names.remove("title")
+    for size in range(len(names) + 1):
+        yield from itertools.combinations(names, size)
+
+
+def build_statement(filters, sort, cursor):
+    kwargs = {}
+    for name in filters:
+        if name == "price":
+            kwargs["price_min"], kwargs["price_max"] = FILTER_VALUES["price"]
+        else:
+            kwargs[name] = FILTER_VALUES[name]
+    stmt = filtered_books_query(select(*BOOK_COLUMNS), **kwargs)
+    return _apply_sort(stmt, sort, cursor).limit(21)
+
+
+async def explain(conn, stmt):
+    """Return (full table scan?, plan as text) for a statement"""
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    if compiled.positiontup:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if conn.dialect.name == "postgresql":
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", params)
+        plan = result.scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+
+        def seq_scans(node):
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") == "books":
+                yield node
+            for child in node.get("Plans", []):
+                yield from seq_scans(child)
+
+        return any(seq_scans(plan[0]["Plan"])), json.dumps(plan[0]["Plan"], indent=1)
+
+    result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", params)
+    details = [row[-1] for row in result.all()]
+    # "SCAN books" without an index is a full table scan
+    full_scan = any(d.startswith("SCAN books") and "INDEX" not in d for d in details)
+    return full_scan, "\n".join(details)
+
+
+async def main(args):
+    await seed_catalogue(args.books)
+
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+        row = (await conn.execute(select(*BOOK_COLUMNS).limit(1))).mappings().one()
+
+        failures = []
+        checked = 0
+        for filters in combinations(conn.dialect.name):
+            for sort in SORT_KEYS:
+                for cursor in (None, encode_cursor(sort, row)):
+                    stmt = build_statement(filters, sort, cursor)
+                    full_scan, plan = await explain(conn, stmt)
+                    checked += 1
+                    label = f"filters={','.join(filters) or '-'} sort={sort} cursor={'yes' if cursor else 'no'}"
+                    if full_scan:
+                        failures.append((label, plan))
+                    elif args.verbose:
+                        print(f"ok   {label}")
+    await engine.dispose()
+
+    for label, plan in failures:
+        print(f"FAIL {label}\n{plan}\n")
+    print(f"{checked - len(failures)}/{checked} query shapes use an index")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=200_000, help="catalogue size")
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(main(parser.parse_args()))
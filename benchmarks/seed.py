@@ -0,0 +1,97 @@
+"""
+Synthetic catalogue for the load tests: books spread over every course code,
+owned by a handful of fake sellers. Inserts go through Core in big chunks so
+a million rows is minutes, not hours.
+"""
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+
+from app.database import Base, engine
+from app.data.coursedata import FIXED_COURSE_CODES, seed_data
+from app.migrate import migrate
+from app.models.book import BookDBModel
+from app.userDB import User
+
+CONDITIONS = ["new", "like new", "good", "acceptable", "worn"]
+SUBJECTS = ["Linear Algebra", "Calculus", "Mechanics", "Thermodynamics", "Algorithms",
+            "Databases", "Signals and Systems", "Organic Chemistry", "Statistics",
+            "Control Theory", "Electromagnetics", "Fluid Mechanics", "Compilers"]
+QUALIFIERS = ["Introduction to", "Applied", "Fundamentals of", "Advanced", "Modern", ""]
+AUTHORS = ["Lay", "Adams", "Cormen", "Strang", "Persson", "Böiers", "Nilsson",
+           "Meriam", "Çengel", "Kreyszig", "Ogata", "Griffiths", "Aho"]
+
+SELLERS = 50
+CHUNK_SIZE = 5000
+
+
+def _seller_rows():
+    return [
+        {
+            "id": uuid.UUID(int=i + 1),
+            "email": f"seller{i}@example.com",
+            # Never logged in with, only needs to be non-empty
+            "hashed_password": "x",
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }
+        for i in range(SELLERS)
+    ]
+
+
+def _book_rows(count: int, start_id: int, rng: random.Random):
+    now = datetime.utcnow()
+    for i in range(count):
+        subject = rng.choice(SUBJECTS)
+        yield {
+            "title": f"{rng.choice(QUALIFIERS)} {subject} {rng.randint(1, 12)}".strip(),
+            "author": rng.choice(AUTHORS),
+            "price": rng.randint(20, 1200),
+            "description": f"{subject} textbook, {rng.choice(CONDITIONS)}, pickup on campus",
+            "condition": rng.choice(CONDITIONS),
+            "course_code": rng.choice(FIXED_COURSE_CODES),
+            "image_url": f"https://images.invalid/{start_id + i}.jpg",
+            "image_status": "ready",
+            "user_id": uuid.UUID(int=rng.randint(1, SELLERS)),
+            "created_at": now - timedelta(seconds=start_id + i),
+        }
+
+
+async def seed_catalogue(books: int, reseed: bool = False, seed: int = 42):
+    """Make sure the database holds `books` synthetic listings, returns the count"""
+    if reseed:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    # Same schema as a deploy, and an existing bench database gets the
+    # columns added since it was made. Alembic runs its own event loop.
+    await asyncio.to_thread(migrate)
+    await seed_data()
+
+    async with engine.begin() as conn:
+        existing = (await conn.execute(select(func.count()).select_from(BookDBModel))).scalar_one()
+        if existing >= books:
+            print(f"Catalogue already has {existing} books, not seeding")
+            return existing
+
+        if not (await conn.execute(select(User.id).where(User.id == uuid.UUID(int=1)))).first():
+            await conn.execute(insert(User), _seller_rows())
+
+        rng = random.Random(seed + existing)
+        started = time.perf_counter()
+        rows = []
+        for row in _book_rows(books - existing, existing, rng):
+            rows.append(row)
+            if len(rows) == CHUNK_SIZE:
+                await conn.execute(insert(BookDBModel), rows)
+                rows = []
+        if rows:
+            await conn.execute(insert(BookDBModel), rows)
+
+    print(f"Seeded {books - existing} books in {time.perf_counter() - started:.1f}s")
+    return books
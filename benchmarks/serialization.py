@@ -0,0 +1,86 @@
+"""
+Per-row cost of serializing a page of books: FastAPI's response_model path
+vs the FAST_BOOK_LISTS path. Also checks both produce the same bytes.
+
+    python -m benchmarks.serialization [rows] [repeats]
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET", "benchmark")
+
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.schemas.book import BookAPIModel
+from app.schemas.serialization import encode_books
+
+
+def make_rows(count: int):
+    start = datetime(2025, 1, 1, 12, 0, 0, 123456)
+    return [
+        {
+            "id": i,
+            "title": f"Linear Algebra och dess tillämpningar, upplaga {i % 9}",
+            "author": "David C. Lay \"Jr\"",
+            "price": 100 + i % 500,
+            "description": "Lite understrykningar\nannars i fint skick ✓",
+            "condition": "good",
+            "course_code": "MVE425",
+            "image_url": None if i % 5 == 0 else f"https://res.cloudinary.com/x/{i}.jpg",
+            "image_status": "ready",
+            "image_variants": None if i % 5 == 0 else [
+                {"width": width, "format": fmt, "url": f"https://res.cloudinary.com/x/{i}-{width}.{fmt}"}
+                for width in (320, 640) for fmt in ("webp", "jpeg")
+            ],
+            "user_id": uuid.UUID(int=i),
+            "created_at": start + timedelta(seconds=i, microseconds=-(i % 2) * 123456),
+            "updated_at": None if i % 3 == 0 else start + timedelta(days=1, seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+async def fastapi_path(field, rows) -> bytes:
+    content = await serialize_response(field=field, response_content=rows, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def main(count: int, repeats: int):
+    rows = make_rows(count)
+    field = create_model_field(name="Response", type_=List[BookAPIModel], mode="serialization")
+
+    slow = await fastapi_path(field, rows)
+    fast = encode_books(rows)
+    if slow != fast:
+        print("Output differs!")
+        sys.exit(1)
+    print(f"Output identical ({len(fast)} bytes for {count} rows)")
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        await fastapi_path(field, rows)
+    slow_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        encode_books(rows)
+    fast_time = time.perf_counter() - started
+
+    per_row = lambda total: total / (repeats * count) * 1e6
+    print(f"response_model: {per_row(slow_time):.2f} us/row")
+    print(f"fast path:      {per_row(fast_time):.2f} us/row")
+    print(f"speedup:        {slow_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(count, repeats))
@@ -1 +1,6 @@
-# empty for now, use to migrate database otherwise
\ No newline at end of file
+#!/bin/sh
+# Heroku release phase: runs once per deploy, before the new dynos start.
+# Migrates the schema and seeds the course codes so workers boot without DDL.
+set -e
+
+python -m app.release